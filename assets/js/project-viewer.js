@@ -28,6 +28,14 @@ class ProjectViewer {
                 viewer.classList.add('loaded');
             });
 
+            // Swap a coarse LOD preview for the full model once it is on screen
+            const fullSrc = viewer.dataset.fullSrc;
+            if (fullSrc && viewer.getAttribute('src') !== fullSrc) {
+                viewer.addEventListener('load', () => {
+                    viewer.setAttribute('src', fullSrc);
+                }, { once: true });
+            }
+
             // Add error handling
             viewer.addEventListener('error', (event) => {
                 console.error('Model loading error:', event);
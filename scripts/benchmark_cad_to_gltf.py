@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite for the CAD-to-GLTF Converter
+=============================================
+
+Times the converter's pipeline stages (load_stl / load_step, optimize_mesh,
+export_gltf) separately on procedural fixtures from 1k to 10M triangles and
+on the project STLs in assets/images/projects/, then compares the timings
+against a stored baseline and fails on regressions.
+
+Fixtures:
+---------
+- torus-<scale>.stl  - Binary STL torus, written in row blocks so even the
+                       10M-triangle fixture never sits in memory at once
+- bracket-<scale>.step - Grid of independent filleted brackets with a hole
+                       (needs cadquery-ocp; skipped otherwise)
+- projects/...        - Every STL under assets/images/projects/
+
+Procedural fixtures are generated on first use and kept in the fixture
+directory, so everything runs offline.
+
+Usage:
+------
+    python benchmark_cad_to_gltf.py --save-baseline      # record a baseline (1k-1M)
+    python benchmark_cad_to_gltf.py --compare            # run and compare against it
+    python benchmark_cad_to_gltf.py --compare run.json   # compare a saved run (-o) without running
+    python benchmark_cad_to_gltf.py --scales 10m --repeat 1
+    python benchmark_cad_to_gltf.py --threshold 0.1      # fail above +10%
+
+A baseline for the default fixtures is committed as benchmark_baseline.json.
+Timings only compare on the machine that recorded them, so --compare
+refuses a baseline from another machine (see MACHINE_FIELDS) unless
+--any-machine is given. Regenerate it on the machine that runs --compare
+with --save-baseline and commit the result.
+
+Author: MESGRO Project
+License: MIT
+"""
+
+import argparse
+import contextlib
+import gc
+import importlib
+import io
+import json
+import math
+import os
+import platform
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import trimesh
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import cad_to_gltf  # noqa: E402
+
+# =============================================================================
+# Settings
+# =============================================================================
+
+# Nominal fixture sizes in triangles
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+DEFAULT_SCALES = ('1k', '10k', '100k', '1m')
+
+# Bump whenever a generator changes, so cached fixtures are rebuilt
+FIXTURE_VERSION = 1
+
+DEFAULT_FIXTURE_DIR = cad_to_gltf.DEFAULT_CACHE_DIR.parent / 'benchmarks'
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'benchmark_baseline.json'
+PROJECT_FIXTURES = cad_to_gltf.PROJECTS_DIR
+
+# A stage regresses when it is this much slower than the baseline...
+DEFAULT_THRESHOLD = 0.25
+# ...and slower by at least this many seconds, so timer noise on tiny
+# fixtures can't fail a run
+NOISE_FLOOR = 0.005
+
+# Results' machine details that must match the baseline's for --compare
+# (only the OS part of 'platform')
+MACHINE_FIELDS = ('platform', 'processor', 'cpu_count', 'python', 'numpy', 'trimesh')
+
+# Triangles written per block by the STL generator
+STL_BLOCK_TRIANGLES = 1 << 20
+
+
+@dataclass
+class Fixture:
+    name: str
+    path: Path
+    kind: str  # 'stl' or 'step'
+
+
+# =============================================================================
+# Fixtures
+# =============================================================================
+
+def write_torus_stl(path: Path, triangles: int) -> int:
+    """
+    Write a binary STL torus with about `triangles` triangles.
+
+    The facets are written straight into a memory-mapped file one block of
+    rings at a time. Returns the exact triangle count.
+    """
+    minor = max(3, round(math.sqrt(triangles / 8)))
+    major = max(3, round(triangles / (2 * minor)))
+    count = 2 * major * minor
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'MESGRO benchmark torus'.ljust(80, b' '))
+        f.write(count.to_bytes(4, 'little'))
+    facets = np.memmap(path, dtype=cad_to_gltf.STL_BINARY_DTYPE, mode='r+', offset=84, shape=(count,))
+
+    def ring(i: np.ndarray) -> np.ndarray:
+        u = 2 * np.pi * (i % major) / major
+        v = 2 * np.pi * np.arange(minor) / minor
+        radius = 50.0 + 15.0 * np.cos(v)
+        return np.stack([radius * np.cos(u[:, None]), radius * np.sin(u[:, None]),
+                         np.broadcast_to(15.0 * np.sin(v), (len(u), minor))], axis=-1)
+
+    rows = max(1, STL_BLOCK_TRIANGLES // (2 * minor))
+    for start in range(0, major, rows):
+        i = np.arange(start, min(start + rows, major))
+        a, b = ring(i), ring(i + 1)
+        c, d = np.roll(a, -1, axis=1), np.roll(b, -1, axis=1)
+        block = np.stack([np.stack([a, b, d], axis=2), np.stack([a, d, c], axis=2)], axis=2)
+        facets['vertices'][2 * minor * start:2 * minor * i[-1] + 2 * minor] = block.reshape(-1, 3, 3)
+    facets.flush()
+    del facets
+    return count
+
+
+def _occ_module(name: str):
+    """Import an OpenCASCADE module from cadquery-ocp or pythonocc-core."""
+    try:
+        return importlib.import_module(f'OCP.{name}')
+    except ImportError:
+        return importlib.import_module(f'OCC.Core.{name}')
+
+
+def _bracket():
+    """A 40 x 20 x 10 mm block with filleted edges and a 12 mm through hole."""
+    primitives = _occ_module('BRepPrimAPI')
+    gp = _occ_module('gp')
+    explorer = _occ_module('TopExp').TopExp_Explorer
+    topods = _occ_module('TopoDS')
+    to_edge = getattr(topods, 'TopoDS', None) or topods.topods
+    to_edge = getattr(to_edge, 'Edge_s', None) or to_edge.Edge
+
+    box = primitives.BRepPrimAPI_MakeBox(40.0, 20.0, 10.0).Shape()
+    fillet = _occ_module('BRepFilletAPI').BRepFilletAPI_MakeFillet(box)
+    edges = explorer(box, _occ_module('TopAbs').TopAbs_EDGE)
+    while edges.More():
+        fillet.Add(2.0, to_edge(edges.Current()))
+        edges.Next()
+    axis = gp.gp_Ax2(gp.gp_Pnt(20.0, 10.0, -1.0), gp.gp_Dir(0.0, 0.0, 1.0))
+    hole = primitives.BRepPrimAPI_MakeCylinder(axis, 6.0, 12.0).Shape()
+    return _occ_module('BRepAlgoAPI').BRepAlgoAPI_Cut(fillet.Shape(), hole).Shape()
+
+
+def write_bracket_step(path: Path, triangles: int) -> int:
+    """
+    Write a STEP grid of independent brackets meshing to about `triangles`
+    triangles at the default deflections. Returns the number of brackets.
+    """
+    _, occ = cad_to_gltf._occ()
+    probe = _bracket()
+    cad_to_gltf._tessellate(occ, probe, cad_to_gltf.DEFAULT_LINEAR_DEFLECTION,
+                            cad_to_gltf.DEFAULT_ANGULAR_DEFLECTION)
+    per_part = len(cad_to_gltf._extract_triangulation(occ, probe)[1])
+    parts = max(1, round(triangles / per_part))
+
+    gp = _occ_module('gp')
+    transform = _occ_module('BRepBuilderAPI').BRepBuilderAPI_Transform
+    bracket = _bracket()
+    compound = occ.TopoDS_Compound()
+    builder = occ.BRep_Builder()
+    builder.MakeCompound(compound)
+    columns = math.ceil(math.sqrt(parts))
+    for index in range(parts):
+        trsf = gp.gp_Trsf()
+        trsf.SetTranslation(gp.gp_Vec(50.0 * (index % columns), 30.0 * (index // columns), 0.0))
+        # Copy, so every bracket has its own geometry to mesh
+        builder.Add(compound, transform(bracket, trsf, True).Shape())
+
+    step = _occ_module('STEPControl')
+    writer = step.STEPControl_Writer()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _quiet_native_stdout():
+        writer.Transfer(compound, step.STEPControl_AsIs)
+        status = writer.Write(str(path))
+    if status != 1:
+        raise RuntimeError(f"Failed to write {path}")
+    return parts
+
+
+@contextlib.contextmanager
+def _quiet_native_stdout():
+    """Silence OCCT's transfer statistics, which bypass sys.stdout."""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(os.devnull, 'w') as devnull:
+        os.dup2(devnull.fileno(), 1)
+        try:
+            yield
+        finally:
+            os.dup2(saved, 1)
+            os.close(saved)
+
+
+def prepare_fixtures(fixture_dir: Path, scales: List[str], step: bool = True,
+                     projects: bool = True) -> List[Fixture]:
+    """Generate missing procedural fixtures and collect the project STLs."""
+    fixture_dir = fixture_dir / f'v{FIXTURE_VERSION}'
+    fixtures = []
+    for scale in scales:
+        path = fixture_dir / f'torus-{scale}.stl'
+        if not path.exists():
+            print(f"  Generating {path.name}...")
+            write_torus_stl(path.with_suffix('.tmp'), SCALES[scale])
+            path.with_suffix('.tmp').replace(path)
+        fixtures.append(Fixture(path.stem, path, 'stl'))
+
+    if step and scales:
+        ok, _ = cad_to_gltf.check_step_support()
+        if not ok:
+            print("  Skipping STEP fixtures: cadquery-ocp is not installed")
+        for scale in scales if ok else ():
+            path = fixture_dir / f'bracket-{scale}.step'
+            if not path.exists():
+                print(f"  Generating {path.name}...")
+                write_bracket_step(path.with_suffix('.tmp'), SCALES[scale])
+                path.with_suffix('.tmp').replace(path)
+            fixtures.append(Fixture(path.stem, path, 'step'))
+
+    if projects:
+        for path in sorted(PROJECT_FIXTURES.rglob('*.stl')):
+            name = 'projects/' + path.relative_to(PROJECT_FIXTURES).as_posix()
+            fixtures.append(Fixture(name, path, 'stl'))
+    return fixtures
+
+
+# =============================================================================
+# Benchmark
+# =============================================================================
+
+def _timed(results: Dict[str, float], stage: str, func, *args, **kwargs):
+    """Call func quietly and keep the fastest time seen for stage."""
+    gc.collect()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        value = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    results[stage] = min(elapsed, results.get(stage, math.inf))
+    return value
+
+
+def run_fixture(fixture: Fixture, work_dir: Path, repeat: int = 3) -> Dict:
+    """Best-of-repeat seconds for each pipeline stage of one fixture."""
+    stages: Dict[str, float] = {}
+    options = cad_to_gltf.ConversionOptions()
+    output = work_dir / 'benchmark.glb'
+    for _ in range(repeat):
+        if fixture.kind == 'stl':
+            mesh = _timed(stages, 'load_stl', cad_to_gltf.load_stl, fixture.path)
+        else:
+            mesh = _timed(stages, 'load_step', cad_to_gltf.load_step, fixture.path, options)
+        loaded = len(mesh.faces)
+        # The STL loader welds vertices itself, as in convert()
+        mesh = _timed(stages, 'optimize_mesh', cad_to_gltf.optimize_mesh, mesh,
+                      report=False, merge=fixture.kind != 'stl')
+        _timed(stages, 'export_gltf', cad_to_gltf.export_gltf, mesh, output)
+        del mesh
+    return {'triangles': loaded, 'bytes': output.stat().st_size, 'stages': stages}
+
+
+def run_benchmarks(fixtures: List[Fixture], work_dir: Path, repeat: int = 3) -> Dict:
+    """Run every fixture and return a results document with machine details."""
+    if any(f.kind == 'step' for f in fixtures):
+        cad_to_gltf._occ()  # keep the OCP import out of the first load_step timing
+    results = {}
+    for fixture in fixtures:
+        print(f"  {fixture.name}...", end='', flush=True)
+        start = time.perf_counter()
+        results[fixture.name] = run_fixture(fixture, work_dir, repeat)
+        print(f" {results[fixture.name]['triangles']:,} triangles, {time.perf_counter() - start:.1f}s")
+    return {
+        'converter_version': cad_to_gltf.CONVERTER_VERSION,
+        'fixture_version': FIXTURE_VERSION,
+        'repeat': repeat,
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'trimesh': trimesh.__version__,
+        },
+        'results': results,
+    }
+
+
+def machine_differences(current: Dict, baseline: Dict) -> List[str]:
+    """MACHINE_FIELDS that differ between two results documents, as 'field: baseline → current'."""
+    def fields(document):
+        machine = dict(document.get('machine') or {})
+        # Only the OS counts, not the kernel build in the platform string
+        machine['platform'] = str(machine.get('platform', '')).split('-')[0]
+        return machine
+    ours, theirs = fields(current), fields(baseline)
+    return [f"{field}: {theirs.get(field)} → {ours.get(field)}"
+            for field in MACHINE_FIELDS if ours.get(field) != theirs.get(field)]
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Print current timings next to the baseline and return the regressions.
+
+    A stage regresses when it is more than threshold slower (relative) and
+    at least NOISE_FLOOR seconds slower. Fixtures whose triangle count
+    changed since the baseline are not compared.
+    """
+    regressions = []
+    width = max(len('Fixture'), *(len(name) for name in current['results']))
+    print(f"\n  {'Fixture':<{width}} {'Stage':<14} {'Time':>9} {'Baseline':>9} {'Change':>8}")
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        comparable = base is not None and base['triangles'] == result['triangles']
+        for stage, seconds in result['stages'].items():
+            reference = base['stages'].get(stage) if comparable else None
+            if reference is None:
+                print(f"  {name:<{width}} {stage:<14} {seconds:>8.3f}s {'-':>9} {'new':>8}")
+                continue
+            change = seconds / reference - 1 if reference else 0.0
+            regressed = change > threshold and seconds - reference >= NOISE_FLOOR
+            mark = '  REGRESSION' if regressed else ''
+            print(f"  {name:<{width}} {stage:<14} {seconds:>8.3f}s {reference:>8.3f}s {change:>+8.1%}{mark}")
+            if regressed:
+                regressions.append(f"{name} {stage}: {reference:.3f}s → {seconds:.3f}s ({change:+.1%})")
+    return regressions
+
+
+# =============================================================================
+# Main
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark cad_to_gltf.py stages and compare against a baseline.",
+        epilog=f"Scales: {', '.join(SCALES)} triangles | default: {' '.join(DEFAULT_SCALES)}"
+    )
+    parser.add_argument('--scales', nargs='*', choices=list(SCALES), default=list(DEFAULT_SCALES),
+                        help="Procedural fixture sizes to run (pass none to skip them)")
+    parser.add_argument('--no-step', action='store_true', help="Skip the STEP fixtures")
+    parser.add_argument('--no-projects', action='store_true',
+                        help="Skip the STLs in assets/images/projects/")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Runs per fixture; the fastest time of each stage is kept (default: 3)")
+    parser.add_argument('--fixtures-dir', default=str(DEFAULT_FIXTURE_DIR),
+                        help=f"Where generated fixtures are kept (default: {DEFAULT_FIXTURE_DIR})")
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE),
+                        help="Baseline JSON to compare against or to save (default: %(default)s)")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Write this run's results as the new baseline instead of comparing")
+    parser.add_argument('--compare', nargs='?', const='', metavar='RESULTS',
+                        help="Fail unless a baseline exists and no stage regressed; with RESULTS, "
+                             "compare that saved run (-o) instead of running the fixtures")
+    parser.add_argument('--any-machine', action='store_true',
+                        help="Compare even if the baseline was recorded on a different machine")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Relative slowdown that fails the run (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument('-o', '--output', help="Also write this run's results to a JSON file")
+
+    args = parser.parse_args()
+    baseline_path = Path(args.baseline)
+    if args.compare is not None and args.save_baseline:
+        parser.error("--compare and --save-baseline are mutually exclusive")
+    if args.compare is not None and not baseline_path.exists():
+        print(f"✗ No baseline at {baseline_path}; record one with --save-baseline")
+        sys.exit(2)
+
+    print(f"\n{'='*50}")
+    print("CAD-to-GLTF Benchmark")
+    print(f"{'='*50}")
+    if args.compare:
+        with open(args.compare) as f:
+            current = json.load(f)
+        print(f"  Results: {args.compare}")
+    else:
+        fixtures = prepare_fixtures(Path(args.fixtures_dir), args.scales, step=not args.no_step,
+                                    projects=not args.no_projects)
+        if not fixtures:
+            parser.error("No fixtures selected")
+
+        work_dir = Path(args.fixtures_dir) / 'work'
+        work_dir.mkdir(parents=True, exist_ok=True)
+        current = run_benchmarks(fixtures, work_dir, max(1, args.repeat))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    if args.save_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"\n✓ Baseline saved: {baseline_path}\n")
+        sys.exit(0)
+
+    if not baseline_path.exists():
+        print(f"\nNo baseline at {baseline_path}; record one with --save-baseline\n")
+        sys.exit(0)
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    differences = machine_differences(current, baseline)
+    if differences:
+        print(f"\n{'Note: b' if args.any_machine else '✗ B'}aseline was recorded on a different machine:")
+        for line in differences:
+            print(f"  {line}")
+        if not args.any_machine:
+            print("  Re-record it here with --save-baseline, or pass --any-machine to compare anyway\n")
+            sys.exit(2)
+    regressions = compare(current, baseline, args.threshold)
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s) above {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        print()
+        sys.exit(1)
+    print(f"\n✓ No regressions above {args.threshold:.0%}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+File watcher shared by the --watch modes of cad_to_gltf.py and spice_to_svg.py.
+
+Sleeps on inotify where it is available (Linux) and polls elsewhere. Either
+way the watched trees are rescanned after a wakeup and files are compared by
+size and modification time, so the backend only decides when to look and
+editors that replace files through renames are handled like plain writes.
+
+Usage:
+    watcher = FileWatcher(['assets/images/projects'], {'.stl', '.step'})
+    while True:
+        for path in watcher.changes():
+            ...
+"""
+
+from __future__ import annotations
+
+import ctypes
+import os
+import select
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Quiet period that ends a burst of writes (an exporter writing a large STL,
+# an editor's save-via-rename), and the rescan interval without inotify
+DEBOUNCE_SECONDS = 0.1
+POLL_INTERVAL = 0.25
+
+# inotify events that can change a watched file (linux/inotify.h)
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+class FileWatcher:
+    """Report files under a set of directories that were added or changed."""
+
+    def __init__(self, roots: Iterable[Path], suffixes: Set[str], poll: bool = False):
+        self.roots = [Path(root) for root in roots]
+        self.suffixes = {suffix.lower() for suffix in suffixes}
+        self._libc = None
+        self._fd: Optional[int] = None
+        self._watched: Set[str] = set()
+        if not poll and sys.platform.startswith('linux'):
+            self._open_inotify()
+        self.snapshot = self._scan()
+
+    @property
+    def backend(self) -> str:
+        return 'inotify' if self._fd is not None else 'polling'
+
+    def files(self) -> List[Path]:
+        """Every watched file, as of the last scan."""
+        return sorted(self.snapshot)
+
+    def changes(self) -> List[Path]:
+        """
+        Block until watched files are added or modified, wait for the writes
+        to settle, then return those files. Deletions only update the snapshot.
+        """
+        while True:
+            self._wait(None if self._fd is not None else POLL_INTERVAL)
+            current = self._scan()
+            if current == self.snapshot:
+                continue
+            while True:
+                self._settle()
+                settled = self._scan()
+                if settled == current:
+                    break
+                current = settled
+            changed = sorted(path for path, stat in current.items() if self.snapshot.get(path) != stat)
+            self.snapshot = current
+            if changed:
+                return changed
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _open_inotify(self) -> None:
+        try:
+            self._libc = ctypes.CDLL(None, use_errno=True)
+            fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return
+        if fd >= 0:
+            self._fd = fd
+
+    def _watch_directory(self, directory: str) -> None:
+        if self._fd is None or directory in self._watched:
+            return
+        if self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK) < 0:
+            # Usually fs.inotify.max_user_watches; rescanning on a timer still works
+            print(f"  inotify: {os.strerror(ctypes.get_errno())}, falling back to polling")
+            self.close()
+            return
+        self._watched.add(directory)
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        """(mtime, size) of every matching file, watching any new directory."""
+        files = {}
+        for root in self.roots:
+            for directory, _, names in os.walk(root):
+                self._watch_directory(directory)
+                for name in names:
+                    if os.path.splitext(name)[1].lower() not in self.suffixes:
+                        continue
+                    path = Path(directory, name)
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        continue
+                    files[path.resolve()] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def _wait(self, timeout: Optional[float]) -> bool:
+        """Sleep until inotify reports an event or timeout passes."""
+        if self._fd is None:
+            time.sleep(timeout)
+            return False
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self._fd, 64 * 1024):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def _settle(self) -> None:
+        """Return once DEBOUNCE_SECONDS pass without another event."""
+        if self._fd is None:
+            time.sleep(DEBOUNCE_SECONDS)
+            return
+        while self._wait(DEBOUNCE_SECONDS):
+            pass
@@ -5,28 +5,46 @@ Converts SPICE netlists to professional-quality circuit schematics in SVG format
 
 Features:
 - Professional IEEE/IEC component symbols
-- Automatic wire routing with connection dots
+- Connectivity-driven placement with signals flowing left to right
+- Wires routed around symbols, with junction dots on multi-pin nets
 - Clean black and white output
 - Component labels and values
 - Node labeling
 - Support for R, C, L, D, Q, M, V, I components
+- Subcircuits (.SUBCKT, .INCLUDE, .LIB) drawn as blocks or flattened
 
 Usage:
-    python spice_to_svg.py <spice_file> [output_file.svg]
+    python spice_to_svg.py <spice_file> [output_file.svg] [--flatten] [--grid] [--no-route] [--minify]
+    python spice_to_svg.py --watch [DIR ...] [--poll] [--flatten]
+    python spice_to_svg.py --batch [PATH ...] [-j N] [--report report.json]
 
 Example:
     python spice_to_svg.py circuit.cir
     python spice_to_svg.py circuit.cir schematic.svg
 """
 
+import codecs
+import contextlib
+import glob
+import heapq
+import io
+import json
+import os
 import re
 import sys
 import math
-from typing import Dict, List, Tuple, Set, Optional
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple, Set, Optional, TextIO
 from dataclasses import dataclass, field
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import numpy as np      # placement engine; the grid layout needs nothing
+except ImportError:
+    np = None
 
 
 @dataclass
@@ -40,6 +58,7 @@ class Component:
     y: int = 0          # Y position
     rotation: int = 0   # Rotation in degrees (0, 90, 180, 270)
     ports: Dict[int, Tuple[int, int]] = field(default_factory=dict)  # Pin positions
+    pins: List[str] = field(default_factory=list)  # Pin names of a subcircuit block
 
 
 @dataclass
@@ -49,6 +68,108 @@ class Connection:
     components: List[Tuple[str, int]]  # (component_name, pin_index)
 
 
+@dataclass
+class Subcircuit:
+    """A .SUBCKT definition, parsed once and shared by all of its instances"""
+    name: str
+    pins: List[str]                     # External nodes, in instance order
+    components: Dict[str, Component] = field(default_factory=dict)
+    origin: str = ""                    # file:line of the .SUBCKT statement
+
+
+class NetlistError(Exception):
+    """A netlist that cannot be read or expanded: missing file, recursive subcircuits"""
+
+
+# Bytes read up front to choose a netlist's encoding
+ENCODING_SNIFF_BYTES = 64 * 1024
+
+# How X instances of known subcircuits are drawn: as one block with named
+# pins, or replaced by the components of the subcircuit body
+EXPAND_MODES = ('block', 'flatten')
+
+# Nodes shared by every level of the hierarchy even without .GLOBAL
+GROUND_NODES = {'0', 'GND'}
+
+# Component placement: connectivity-driven, or the sorted-name grid
+LAYOUT_MODES = ('auto', 'grid')
+
+# Nesting indent of the written SVG; None writes it without whitespace
+SVG_INDENT = '  '
+
+
+class NetlistLine(NamedTuple):
+    """One logical netlist line: a physical line plus its + continuations"""
+    number: int         # 1-based physical line the statement starts on
+    tokens: List[str]   # whitespace-separated fields of all parts
+    parts: List[str]    # stripped text of each physical line
+
+    @property
+    def text(self) -> str:
+        return ' '.join(self.parts).strip()
+
+
+def sniff_encoding(path: str) -> str:
+    """
+    Pick the encoding of a netlist from its first bytes: a BOM if present,
+    else UTF-8 when the sample decodes as UTF-8, else Latin-1 (which accepts
+    any byte, so the file never has to be read twice).
+    """
+    with open(path, 'rb') as f:
+        sample = f.read(ENCODING_SNIFF_BYTES)
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        # Incremental so a multi-byte character cut off by the sample size is fine
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+
+def open_netlist(path: str) -> TextIO:
+    """Open a netlist for streaming in its sniffed encoding."""
+    encoding = sniff_encoding(path)
+    # A stray non-UTF-8 byte past the sample becomes U+FFFD instead of failing
+    return open(path, 'r', encoding=encoding, errors='replace' if encoding == 'utf-8' else 'strict')
+
+
+def tokenize_netlist(lines: Iterable[str]) -> Iterator[NetlistLine]:
+    """
+    Stream logical lines from physical ones in a single pass.
+
+    Lines starting with + continue the previous statement; their tokens are
+    appended to its token list, so long continued statements cost linear
+    time. Blank lines and * comments (with their continuations) are
+    skipped. Only one statement is held in memory at a time.
+    """
+    current: Optional[NetlistLine] = None
+    comment = False
+    for number, line in enumerate(lines, 1):
+        if line.startswith('+'):
+            rest = line[1:].strip()
+            if comment:
+                continue
+            if current is not None:
+                current.parts.append(rest)
+                current.tokens.extend(rest.split())
+            elif rest:
+                # Nothing to continue (e.g. after a blank line): it stands alone
+                current = NetlistLine(number, rest.split(), [rest])
+            continue
+        if current is not None:
+            yield current
+            current = None
+        stripped = line.strip()
+        comment = stripped.startswith('*')
+        if stripped and not comment:
+            current = NetlistLine(number, stripped.split(), [stripped])
+    if current is not None:
+        yield current
+
+
 class SPICEParser:
     """Parses SPICE netlists with support for common component types"""
     
@@ -66,79 +187,229 @@ class SPICEParser:
         'U': 'IC/Chip',
     }
     
-    def __init__(self, filepath: str = None, content: str = None):
+    def __init__(self, filepath: str = None, content: str = None, expand: str = 'block'):
+        if expand not in EXPAND_MODES:
+            raise ValueError(f"expand must be one of {EXPAND_MODES}, not {expand!r}")
         self.filepath = filepath
         self.content = content
+        self.expand = expand
         self.components: Dict[str, Component] = {}
         self.connections: Dict[str, Connection] = {}
+        self.subcircuits: Dict[str, Subcircuit] = {}    # by upper-case name
+        self.global_nodes: Set[str] = set(GROUND_NODES)
+        self.sources: List[str] = []                    # every file read, main netlist first
         self.title = "Circuit Schematic"
+        self._scopes: List[Subcircuit] = []             # open .SUBCKT blocks
+        self._reading: List[str] = []                   # include stack, for cycles
+        self._included: Set[Tuple[str, str]] = set()    # (file, .LIB section) already read
+        self._flattened: Dict[str, List[Component]] = {}
         
     def parse(self) -> Tuple[Dict[str, Component], Dict[str, Connection]]:
-        """Parse SPICE netlist file or content"""
+        """Parse SPICE netlist file or content; raises NetlistError if it cannot be read"""
         if self.filepath:
             try:
-                with open(self.filepath, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
+                self._read_file(os.path.abspath(self.filepath))
             except FileNotFoundError:
-                print(f"Error: File '{self.filepath}' not found")
-                sys.exit(1)
-            except UnicodeDecodeError:
-                with open(self.filepath, 'r', encoding='latin-1') as f:
-                    lines = f.readlines()
+                raise NetlistError(f"File '{self.filepath}' not found") from None
+            except OSError as e:
+                raise NetlistError(f"Cannot read '{self.filepath}': {e.strerror}") from None
         elif self.content:
-            lines = self.content.split('\n')
+            self._parse_lines(tokenize_netlist(io.StringIO(self.content)), os.getcwd(), '<input>')
         else:
-            print("Error: No input provided")
-            sys.exit(1)
+            raise NetlistError("No input provided")
+        
+        for scope in self._scopes:
+            print(f"Warning: .SUBCKT {scope.name} ({scope.origin}) has no .ENDS")
+        self._scopes.clear()
+        try:
+            self._resolve_instances()
+        except ValueError as e:
+            raise NetlistError(str(e)) from None
+        
+        # Build connection map
+        self._build_connections()
         
-        # Join continuation lines (lines starting with +)
-        joined_lines = []
-        current_line = ""
+        return self.components, self.connections
+    
+    def _read_file(self, path: str, section: Optional[str] = None, library: bool = False):
+        """Stream one netlist or library file (or one .LIB section of it)"""
+        self.sources.append(path)
+        self._reading.append(path)
+        try:
+            with open_netlist(path) as f:
+                lines = tokenize_netlist(f)
+                if section is not None:
+                    lines = self._library_section(lines, section)
+                elif library:
+                    lines = self._library_body(lines)
+                self._parse_lines(lines, os.path.dirname(path), os.path.basename(path))
+        finally:
+            self._reading.pop()
+    
+    @staticmethod
+    def _library_section(lines: Iterable[NetlistLine], section: str) -> Iterator[NetlistLine]:
+        """The statements between '.LIB section' and its .ENDL"""
+        active = False
         for line in lines:
-            line = line.rstrip()
-            if line.startswith('+'):
-                current_line += ' ' + line[1:].strip()
+            head = line.tokens[0].upper()
+            if not active:
+                active = (head == '.LIB' and len(line.tokens) == 2 and
+                          line.tokens[1].upper() == section.upper())
+            elif head == '.ENDL':
+                return
             else:
-                if current_line:
-                    joined_lines.append(current_line)
-                current_line = line
-        if current_line:
-            joined_lines.append(current_line)
-        
-        for line in joined_lines:
-            line = line.strip()
-            
-            # Skip comments and empty lines
-            if not line or line.startswith('*'):
+                yield line
+    
+    @staticmethod
+    def _library_body(lines: Iterable[NetlistLine]) -> Iterator[NetlistLine]:
+        """Every statement of a whole library, without its '.LIB section' / .ENDL markers"""
+        for line in lines:
+            head = line.tokens[0].upper()
+            if head == '.ENDL' or (head == '.LIB' and len(line.tokens) == 2):
                 continue
+            yield line
+    
+    def _include(self, line: NetlistLine, directory: str, where: str, section: Optional[str] = None,
+                 library: bool = False):
+        """Read a .INCLUDE file, .LIB file or .LIB section, each at most once"""
+        if len(line.tokens) < 2:
+            print(f"Warning: {line.tokens[0]} without a file name ({where})")
+            return
+        path = os.path.abspath(os.path.join(directory, line.tokens[1].strip('"\'')))
+        key = (path, (section or '').upper())
+        if path in self._reading:
+            print(f"Warning: {line.tokens[0]} {line.tokens[1]} includes itself ({where})")
+        elif not os.path.isfile(path):
+            print(f"Warning: {line.tokens[0]} file not found: {path} ({where})")
+        elif key not in self._included:
+            self._included.add(key)
+            self._read_file(path, section, library)
+    
+    def _parse_lines(self, lines: Iterable[NetlistLine], directory: str, filename: str):
+        """Consume tokenized statements as they are read"""
+        top_level = len(self._reading) <= 1
+        for line in lines:
+            head = line.tokens[0]
+            where = f"{filename}:{line.number}"
             
             # Parse directives
-            if line.startswith('.'):
-                if line.upper().startswith('.TITLE'):
-                    self.title = line.split(maxsplit=1)[1] if len(line.split(maxsplit=1)) > 1 else "Circuit"
+            if head.startswith('.'):
+                directive = head.upper()
+                if directive.startswith('.TITLE'):
+                    title = line.text.split(maxsplit=1)
+                    self.title = title[1] if len(title) > 1 else "Circuit"
+                elif directive == '.SUBCKT':
+                    self._open_subcircuit(line.tokens, where)
+                elif directive == '.ENDS':
+                    if self._scopes:
+                        self._scopes.pop()
+                    else:
+                        print(f"Warning: .ENDS without .SUBCKT ({where})")
+                elif directive in ('.INCLUDE', '.INC'):
+                    self._include(line, directory, where)
+                elif directive == '.LIB' and len(line.tokens) >= 2:
+                    # '.LIB file section'; a bare '.LIB file' includes the whole file
+                    self._include(line, directory, where,
+                                  line.tokens[2] if len(line.tokens) > 2 else None, library=True)
+                elif directive == '.GLOBAL':
+                    self.global_nodes.update(line.tokens[1:])
                 continue
             
             # First line is often the title
-            if not self.components and not line.startswith('.'):
-                first_char = line[0].upper() if line else ''
-                if first_char not in self.COMPONENT_TYPES:
-                    self.title = line
-                    continue
+            if (top_level and not self._scopes and not self.components and
+                    head[0].upper() not in self.COMPONENT_TYPES):
+                self.title = line.text
+                continue
             
-            # Parse component lines
-            self._parse_component_line(line)
-        
-        # Build connection map
-        self._build_connections()
-        
-        return self.components, self.connections
+            # Parse component lines into the innermost open subcircuit
+            comp = self._parse_component_line(line.tokens)
+            if comp is not None:
+                target = self._scopes[-1].components if self._scopes else self.components
+                target[comp.name] = comp
     
-    def _parse_component_line(self, line: str):
-        """Parse a single component line with improved value extraction"""
-        parts = line.split()
-        if not parts:
+    def _open_subcircuit(self, tokens: List[str], where: str):
+        """Start collecting a .SUBCKT name pin... [PARAMS: k=v ...] body"""
+        if len(tokens) < 2:
+            print(f"Warning: .SUBCKT without a name ({where})")
             return
-        
+        pins = []
+        for token in tokens[2:]:
+            if '=' in token or token.upper() == 'PARAMS:':
+                break
+            pins.append(token)
+        subckt = Subcircuit(tokens[1], pins, origin=where)
+        if tokens[1].upper() in self.subcircuits:
+            print(f"Warning: .SUBCKT {tokens[1]} redefined ({where})")
+        # Nested definitions are registered globally, which covers the usual
+        # case of unique names
+        self.subcircuits[tokens[1].upper()] = subckt
+        self._scopes.append(subckt)
+    
+    def _resolve_instances(self):
+        """Attach definitions to X instances: as block pins, or by flattening"""
+        resolved: Dict[str, Component] = {}
+        for name, comp in self.components.items():
+            subckt = self._instance_definition(comp)
+            if subckt is None:
+                resolved[name] = comp
+            elif self.expand == 'flatten':
+                for child in self._expand_instance(comp, subckt, self._flatten(subckt, [])):
+                    resolved[child.name] = child
+            else:
+                comp.pins = list(subckt.pins)
+                resolved[name] = comp
+        self.components = resolved
+    
+    def _instance_definition(self, comp: Component) -> Optional[Subcircuit]:
+        """The definition an X instance refers to, if it exists and fits"""
+        if comp.type != 'X':
+            return None
+        subckt = self.subcircuits.get(comp.value.upper())
+        if subckt is None:
+            if self.subcircuits:
+                print(f"Warning: {comp.name} uses undefined subcircuit {comp.value}")
+            return None
+        if len(comp.nodes) != len(subckt.pins):
+            print(f"Warning: {comp.name} connects {len(comp.nodes)} nodes but "
+                  f"{subckt.name} has {len(subckt.pins)} pins")
+            return None
+        return subckt
+    
+    def _flatten(self, subckt: Subcircuit, stack: List[str]) -> List[Component]:
+        """
+        The body of subckt with nested instances expanded, with names and
+        internal nodes relative to the subcircuit. Memoized, so each
+        definition is flattened once however often it is instantiated.
+        """
+        key = subckt.name.upper()
+        if key in self._flattened:
+            return self._flattened[key]
+        if key in stack:
+            raise ValueError(f"Subcircuit {subckt.name} instantiates itself "
+                             f"({' → '.join(stack + [key])})")
+        body = []
+        for comp in subckt.components.values():
+            child = self._instance_definition(comp)
+            if child is None:
+                body.append(comp)
+            else:
+                body.extend(self._expand_instance(comp, child, self._flatten(child, stack + [key])))
+        self._flattened[key] = body
+        return body
+    
+    def _expand_instance(self, instance: Component, subckt: Subcircuit,
+                         body: List[Component]) -> Iterator[Component]:
+        """Copies of a flattened body named instance.part, wired to the instance's nodes"""
+        mapping = dict(zip(subckt.pins, instance.nodes))
+        prefix = instance.name + '.'
+        for comp in body:
+            nodes = [mapping.get(node) or (node if node.upper() in self.global_nodes or
+                                           node in self.global_nodes else prefix + node)
+                     for node in comp.nodes]
+            yield Component(prefix + comp.name, comp.type, comp.value, nodes, pins=list(comp.pins))
+    
+    def _parse_component_line(self, parts: List[str]) -> Optional[Component]:
+        """Parse a single component from its tokens with improved value extraction"""
         comp_name = parts[0]
         comp_type = comp_name[0].upper()
         
@@ -153,48 +424,51 @@ class SPICEParser:
             # Format: R1 node1 node2 value [model] [params]
             nodes = [parts[1], parts[2]]
             value = self._extract_value(parts[3:])
-            self.components[comp_name] = Component(comp_name, comp_type, value, nodes)
+            return Component(comp_name, comp_type, value, nodes)
         
         elif comp_type == 'D':
             # Format: D1 anode cathode model [params]
             nodes = [parts[1], parts[2]]
             value = parts[3] if len(parts) > 3 else "D"
-            self.components[comp_name] = Component(comp_name, comp_type, value, nodes)
+            return Component(comp_name, comp_type, value, nodes)
         
         elif comp_type == 'Q':
             # Format: Q1 collector base emitter [substrate] model
             if len(parts) >= 5:
                 nodes = [parts[1], parts[2], parts[3]]  # C, B, E
                 value = parts[4] if len(parts) > 4 else "NPN"
-                self.components[comp_name] = Component(comp_name, comp_type, value, nodes)
+                return Component(comp_name, comp_type, value, nodes)
         
         elif comp_type == 'M':
             # Format: M1 drain gate source bulk model [params]
             if len(parts) >= 6:
                 nodes = [parts[1], parts[2], parts[3], parts[4]]  # D, G, S, B
                 value = parts[5] if len(parts) > 5 else "NMOS"
-                self.components[comp_name] = Component(comp_name, comp_type, value, nodes)
+                return Component(comp_name, comp_type, value, nodes)
         
         elif comp_type == 'J':
             # Format: J1 drain gate source model
             if len(parts) >= 5:
                 nodes = [parts[1], parts[2], parts[3]]  # D, G, S
                 value = parts[4] if len(parts) > 4 else "JFET"
-                self.components[comp_name] = Component(comp_name, comp_type, value, nodes)
+                return Component(comp_name, comp_type, value, nodes)
         
         elif comp_type in ['V', 'I']:
             # Format: V1 n+ n- [DC value] [AC mag [phase]] [transient]
             nodes = [parts[1], parts[2]]
             value = self._extract_source_value(parts[3:])
-            self.components[comp_name] = Component(comp_name, comp_type, value, nodes)
+            return Component(comp_name, comp_type, value, nodes)
         
         elif comp_type in ['X', 'U']:
             # Subcircuit/IC - variable number of nodes
-            # Last part is the subcircuit name
-            if len(parts) >= 3:
-                nodes = parts[1:-1]
-                value = parts[-1]
-                self.components[comp_name] = Component(comp_name, comp_type, value, nodes)
+            # Last part before any [PARAMS:] name=value pairs is the subcircuit name
+            end = len(parts)
+            while end > 1 and ('=' in parts[end - 1] or parts[end - 1].upper() == 'PARAMS:'):
+                end -= 1
+            if end >= 3:
+                nodes = parts[1:end - 1]
+                value = parts[end - 1]
+                return Component(comp_name, comp_type, value, nodes)
     
     def _extract_value(self, parts: List[str]) -> str:
         """Extract component value from remaining parts"""
@@ -226,6 +500,266 @@ class SPICEParser:
                 self.connections[node].components.append((comp_name, pin_idx))
 
 
+class WireRouter:
+    """
+    Grid-based maze router for schematic wires.
+
+    The canvas is divided into PITCH-sized cells, and that uniform grid is also
+    the spatial index: symbol bodies are stamped into a blocked bitmap, and
+    every routed wire records its net per cell and axis, so each collision
+    query is a constant-time lookup however many nets are on the sheet.
+    Connections are found with A* (Manhattan heuristic, extra cost per bend
+    and per crossing), and a multi-pin net grows as a rectilinear Steiner tree
+    by routing each pin to the nearest point of the tree built so far. Wires
+    of different nets may cross at right angles but never share a track,
+    bend on one another or pass through another net's pin.
+
+    All searches draw on one budget of SHEET_EXPANSIONS per pin on the sheet,
+    so routing time stays linear in the pin count however many pins turn out
+    to be walled in; once it is spent the remaining pins fail at once and
+    keep a direct wire.
+    """
+
+    PITCH = 10              # Grid step (px); component ports sit on multiples of it
+    BEND_COST = 3           # Extra cost of a bend, in grid steps
+    CROSS_COST = 4          # Extra cost of crossing another net
+    WINDOW = 12             # Cells searched around a connection before widening
+    WIDEN = 4               # Window growth factor of the retry
+    EXPANSIONS = 2_000      # Search states visited before a pin is given up
+    SHEET_EXPANSIONS = 250  # Search states per pin shared by the whole sheet
+    GREED = 2               # Heuristic weight: >1 trades path length for search speed
+    BUCKET = 16             # Cells per side of the squares tree cells are hashed into
+
+    H, V = 0, 1
+
+    def __init__(self, width: int, height: int, pins: int):
+        self.cols = width // self.PITCH + 1
+        self.rows = height // self.PITCH + 1
+        size = self.cols * self.rows
+        self.blocked = bytearray(size)
+        self.owner = ([-1] * size, [-1] * size)     # Net id using each cell, per axis
+        self.budget = pins * self.SHEET_EXPANSIONS  # Expansions left for the sheet
+
+    def cell(self, x: int, y: int) -> int:
+        return (y // self.PITCH) * self.cols + x // self.PITCH
+
+    def point(self, cell: int) -> Tuple[int, int]:
+        return (cell % self.cols) * self.PITCH, (cell // self.cols) * self.PITCH
+
+    def block(self, x0: int, y0: int, x1: int, y1: int):
+        """Mark every cell of a pixel rectangle as an obstacle"""
+        gx0, gy0 = max(0, -(-x0 // self.PITCH)), max(0, -(-y0 // self.PITCH))
+        gx1, gy1 = min(self.cols - 1, x1 // self.PITCH), min(self.rows - 1, y1 // self.PITCH)
+        if gx0 > gx1:
+            return
+        row = b'\x01' * (gx1 - gx0 + 1)
+        for gy in range(gy0, gy1 + 1):
+            start = gy * self.cols + gx0
+            self.blocked[start:start + len(row)] = row
+
+    def reserve(self, cell: int, front: int, net: int) -> bool:
+        """
+        Claim a pin cell for a net, along with the cell in front of it so that
+        other wires cannot pass or bend there and wall the pin in. False if
+        another net already owns the pin.
+        """
+        h, v = self.owner
+        if h[cell] not in (-1, net):
+            return False
+        self.blocked[cell] = 0
+        h[cell] = v[cell] = net
+        if not self.blocked[front] and h[front] == v[front] == -1:
+            h[front] = v[front] = net
+        return True
+
+    def route_net(self, net: int, pins: List[int]) -> Tuple[List[List[int]], List[int]]:
+        """
+        Connect the (reserved) pin cells of a net, first pin first.
+        Returns the branches as cell paths and the pins that could not be reached.
+        """
+        # Tree cells hashed into BUCKET-sized squares for nearest-cell queries
+        buckets: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        tree = set()
+        
+        def grow(cells):
+            for c in cells:
+                if c not in tree:
+                    tree.add(c)
+                    buckets[(c % self.cols) // self.BUCKET, (c // self.cols) // self.BUCKET].append(c)
+        
+        grow(pins[:1])
+        branches, failed = [], []
+        for pin in pins[1:]:
+            if pin in tree:
+                continue
+            if not self.budget:
+                failed.append(pin)
+                continue
+            anchor = self._nearest(pin, buckets)
+            allowance = min(self.EXPANSIONS, self.budget)
+            path, budget, clipped = self._search(net, pin, tree, anchor, self.WINDOW, allowance)
+            # A walled-in pin fails the same way in a wider window
+            if path is None and budget and clipped:
+                path, budget, _ = self._search(net, pin, tree, anchor, self.WINDOW * self.WIDEN, budget)
+            self.budget -= allowance - budget
+            if path is None:
+                failed.append(pin)
+                continue
+            self._occupy(net, path)
+            grow(path)
+            branches.append(path)
+        return branches, failed
+
+    def _nearest(self, cell: int, buckets: Dict[Tuple[int, int], List[int]]) -> int:
+        """Closest tree cell (Manhattan), scanning bucket rings outwards"""
+        cols, size = self.cols, self.BUCKET
+        x, y = cell % cols, cell // cols
+        bx, by = x // size, y // size
+        reach = max(self.cols, self.rows) // size + 1
+        best, best_dist = -1, None
+        for r in range(reach + 1):
+            for kx in range(bx - r, bx + r + 1):
+                for ky in ((by - r, by + r) if abs(kx - bx) != r else range(by - r, by + r + 1)):
+                    for c in buckets.get((kx, ky), ()):
+                        dist = abs(c % cols - x) + abs(c // cols - y)
+                        if best_dist is None or dist < best_dist:
+                            best, best_dist = c, dist
+            # Cells in the next ring are at least r * size + 1 away
+            if best_dist is not None and best_dist <= r * size:
+                break
+        return best
+
+    def _occupy(self, net: int, path: List[int]):
+        owner = self.owner
+        for a, b in zip(path, path[1:]):
+            axis = self.H if abs(a - b) == 1 else self.V
+            owner[axis][a] = owner[axis][b] = net
+
+    def _search(self, net: int, start: int, tree: Set[int], anchor: int, margin: int,
+                budget: int) -> Tuple[Optional[List[int]], int, bool]:
+        """
+        A* from a pin cell towards the nearest tree cell, ending on any cell of
+        the tree. Returns the path (or None), the expansions left over and
+        whether the window edge cut off an open cell.
+        """
+        cols, rows, blocked = self.cols, self.rows, self.blocked
+        owners = self.owner
+        bend, cross, greed = self.BEND_COST, self.CROSS_COST, self.GREED
+        sx, sy = start % cols, start // cols
+        tx, ty = anchor % cols, anchor // cols
+        wx0 = max(0, min(sx, tx) - margin)
+        wy0 = max(0, min(sy, ty) - margin)
+        wx1 = min(cols - 1, max(sx, tx) + margin)
+        wy1 = min(rows - 1, max(sy, ty) + margin)
+        clipped = False
+
+        # States are cell * 2 + axis of the step that entered the cell; a pin
+        # is left horizontally, so starting vertically counts as a bend
+        first = start * 2 + self.H
+        best = {first: 0}
+        parent = {first: -1}
+        heap = [((abs(sx - tx) + abs(sy - ty)) * greed, 0, first)]
+        while heap and budget:
+            _, g, state = heapq.heappop(heap)
+            if best[state] != g:
+                continue
+            budget -= 1
+            c, axis = state >> 1, state & 1
+            if c in tree:
+                path = []
+                while state != -1:
+                    path.append(state >> 1)
+                    state = parent[state]
+                return path, budget, clipped
+            x, y = c % cols, c // cols
+            for n, nx, ny, step_axis in ((c + 1, x + 1, y, 0), (c - 1, x - 1, y, 0),
+                                         (c + cols, x, y + 1, 1), (c - cols, x, y - 1, 1)):
+                if nx < wx0 or nx > wx1 or ny < wy0 or ny > wy1:
+                    clipped = clipped or (0 <= nx < cols and 0 <= ny < rows and not blocked[n])
+                    continue
+                if blocked[n]:
+                    continue
+                cost = g + 1
+                if step_axis != axis:
+                    # Bending here puts this net on both axes of the cell
+                    o = owners[step_axis][c]
+                    if o != -1 and o != net:
+                        continue
+                    cost += bend
+                o = owners[step_axis][n]
+                if o != -1 and o != net:
+                    continue
+                o = owners[1 - step_axis][n]
+                if o != -1 and o != net:
+                    cost += cross
+                nstate = n * 2 + step_axis
+                if cost < best.get(nstate, cost + 1):
+                    best[nstate] = cost
+                    parent[nstate] = state
+                    heapq.heappush(heap, (cost + (abs(nx - tx) + abs(ny - ty)) * greed, cost, nstate))
+        return None, budget, clipped
+
+
+def _escape(text: str) -> str:
+    """Escape text or an attribute value the way minidom writes it"""
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '"' in text:
+        text = text.replace('"', '&quot;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+
+def write_svg(root: ET.Element, out: TextIO, indent: Optional[str] = SVG_INDENT):
+    """
+    Write an element tree to out as SVG, element by element.
+
+    With an indent, every element starts a line nested by indent, elements
+    holding only text stay on one line and blank lines are dropped: the
+    layout minidom's toprettyxml() used to produce, without building the
+    document as a string. With indent=None nothing is written between tags.
+    """
+    pretty = indent is not None
+    pad_unit = indent or ''
+    started = False
+    
+    def emit(text: str):
+        nonlocal started
+        if not pretty:
+            out.write(text)
+            return
+        for line in text.split('\n') if '\n' in text else (text,):
+            if line.strip():
+                if started:
+                    out.write('\n')
+                out.write(line)
+                started = True
+    
+    def element(elem: ET.Element, pad: str):
+        tag = elem.tag
+        start = pad + '<' + tag + ''.join(f' {key}="{_escape(value)}"' for key, value in elem.items())
+        if not len(elem):
+            if elem.text:
+                emit(f'{start}>{_escape(elem.text)}</{tag}>')
+            else:
+                emit(start + '/>')
+            return
+        inner = pad + pad_unit
+        emit(start + '>')
+        if elem.text:
+            emit(inner + _escape(elem.text))
+        for child in elem:
+            element(child, inner)
+            if child.tail:
+                emit(inner + _escape(child.tail))
+        emit(f'{pad}</{tag}>')
+    
+    element(root, '')
+
+
 class SchematicRenderer:
     """
     Renders professional-quality circuit schematics to SVG.
@@ -246,15 +780,47 @@ class SchematicRenderer:
     MARGIN = 80
     COMP_SPACING_X = 180    # Horizontal spacing between components
     COMP_SPACING_Y = 140    # Vertical spacing between components
-    COLS_MAX = 5            # Maximum columns before wrapping
+    COLS_MAX = 5            # Maximum columns before wrapping (grid layout)
+    
+    # Placement engine settings
+    GROUND_NAMES = ('0', 'GND', 'VSS', 'GROUND')
+    PLACE_ROUNDS = 30       # Smoothing + legalization rounds
+    PLACE_SMOOTHING = 4     # Net-centroid iterations per round
+    PLACE_FLOW_WEIGHT = 0.1 # Pull towards the signal-flow column
+    
+    # Symbol library: component type -> (symbol id, drawing method). Every
+    # symbol is drawn once into <defs> and each part is a <use> of it;
+    # subcircuit blocks get one symbol per distinct pin list
+    SYMBOL_LIBRARY = {
+        'R': ('resistor', '_draw_resistor_symbol'),
+        'C': ('capacitor', '_draw_capacitor_symbol'),
+        'L': ('inductor', '_draw_inductor_symbol'),
+        'D': ('diode', '_draw_diode_symbol'),
+        'Q': ('bjt', '_draw_bjt_symbol'),
+        'M': ('mosfet', '_draw_mosfet_symbol'),
+        'J': ('jfet', '_draw_jfet_symbol'),
+        'V': ('voltage-source', '_draw_voltage_source_symbol'),
+        'I': ('current-source', '_draw_current_source_symbol'),
+    }
+    GENERIC_SYMBOL = ('generic', '_draw_generic_symbol')
     
-    def __init__(self, components: Dict[str, Component], connections: Dict[str, Connection], title: str = "Circuit Schematic"):
+    def __init__(self, components: Dict[str, Component], connections: Dict[str, Connection],
+                 title: str = "Circuit Schematic", layout: str = 'auto',
+                 indent: Optional[str] = SVG_INDENT, route: bool = True):
+        if layout not in LAYOUT_MODES:
+            raise ValueError(f"layout must be one of {LAYOUT_MODES}, not {layout!r}")
         self.components = components
         self.connections = connections
         self.title = title
+        self.layout = layout
+        self.indent = indent
+        self.route = route
         self.width = 1200
         self.height = 800
         self.node_positions: Dict[str, List[Tuple[int, int]]] = defaultdict(list)  # Track wire endpoints per node
+        self.unrouted = 0
+        self.defs: Optional[ET.Element] = None
+        self.symbols: Dict[Tuple[str, ...], Tuple[str, Dict[int, Tuple[int, int]]]] = {}  # Drawn symbols and their ports
         
     def render(self, output_file: str):
         """Render the schematic to an SVG file"""
@@ -267,6 +833,7 @@ class SchematicRenderer:
         # Create SVG root
         root = ET.Element('svg', {
             'xmlns': 'http://www.w3.org/2000/svg',
+            'xmlns:xlink': 'http://www.w3.org/1999/xlink',
             'viewBox': f'0 0 {self.width} {self.height}',
             'width': str(self.width),
             'height': str(self.height),
@@ -292,7 +859,10 @@ class SchematicRenderer:
             self._draw_component(components_group, labels_group, comp)
         
         # Draw wires between connected components
-        self._draw_all_connections(wires_group)
+        if self.route:
+            self._draw_all_connections(wires_group)
+        else:
+            self._draw_direct_connections(wires_group)
         
         # Add legend
         self._add_legend(root)
@@ -303,8 +873,108 @@ class SchematicRenderer:
         print(f"✓ Schematic saved to: {output_file}")
         print(f"  - {len(self.components)} components")
         print(f"  - {len(self.connections)} nodes")
+        if self.unrouted:
+            print(f"  - {self.unrouted} pins could not be routed and use direct wires")
     
     def _calculate_layout(self):
+        """Calculate component positions with the selected layout mode"""
+        if self.layout == 'auto' and np is not None and len(self.components) > 1:
+            self._netlist_layout()
+        else:
+            self._grid_layout()
+    
+    def _netlist_layout(self):
+        """
+        Place connected components next to each other, signals flowing left to right.
+
+        Components are first layered by their distance in nets from the V/I
+        sources, which gives each a preferred column. Placement then
+        alternates two steps, as in analytic placers such as SimPL:
+        smoothing moves every component towards the centroids of its nets
+        (star model, weighted 1/(pins-1), ground excluded) while anchored
+        to its last legal slot; legalization sorts the components into
+        columns by x and each column by y. Every step is a few NumPy
+        bincount/argsort calls, so thousands of components take seconds.
+        """
+        names = sorted(self.components)
+        index = {name: i for i, name in enumerate(names)}
+        n = len(names)
+        
+        pin_comp, pin_net = [], []
+        for net_idx, (node, conn) in enumerate(sorted(self.connections.items())):
+            if node.upper() in self.GROUND_NAMES or len(conn.components) < 2:
+                continue
+            for comp_name, _ in conn.components:
+                pin_comp.append(index[comp_name])
+                pin_net.append(net_idx)
+        pin_comp = np.array(pin_comp, dtype=np.int64)
+        pin_net = np.unique(np.array(pin_net, dtype=np.int64), return_inverse=True)[1].ravel()
+        num_nets = int(pin_net.max()) + 1 if len(pin_net) else 0
+        degree = np.bincount(pin_net, minlength=num_nets).astype(float)
+        weight = 1.0 / np.maximum(degree[pin_net] - 1, 1)
+        comp_weight = np.bincount(pin_comp, weights=weight, minlength=n)
+        
+        layer = self._signal_layers(names, pin_comp, pin_net, num_nets)
+        layers = int(layer.max()) + 1
+        base = math.ceil(math.sqrt(n * self.COMP_SPACING_Y / self.COMP_SPACING_X))
+        cols = max(1, min(max(base, min(layers, 2 * base)), n))
+        rows = math.ceil(n / cols)
+        flow = layer / max(layers - 1, 1) * (cols - 1)
+        
+        def net_pull(coord):
+            """Weighted sum over each component's nets of the net centroids"""
+            centroid = np.bincount(pin_net, weights=coord[pin_comp], minlength=num_nets) / np.maximum(degree, 1)
+            return np.bincount(pin_comp, weights=weight * centroid[pin_net], minlength=n)
+        
+        # Start from the layering, spread vertically in name order
+        x = flow.copy()
+        y = np.arange(n, dtype=float) % rows
+        for round_idx in range(self.PLACE_ROUNDS):
+            col, row = self._legalize(x, y, rows)
+            # Anchoring grows so the placement settles instead of collapsing
+            anchor = 0.05 + 0.5 * round_idx / self.PLACE_ROUNDS
+            for _ in range(self.PLACE_SMOOTHING):
+                x = ((net_pull(x) + anchor * col + self.PLACE_FLOW_WEIGHT * flow) /
+                     (comp_weight + anchor + self.PLACE_FLOW_WEIGHT))
+                y = (net_pull(y) + anchor * row) / (comp_weight + anchor)
+        col, row = self._legalize(x, y, rows)
+        
+        for i, name in enumerate(names):
+            comp = self.components[name]
+            comp.x = self.MARGIN + int(col[i]) * self.COMP_SPACING_X + self.COMP_SPACING_X // 2
+            comp.y = self.MARGIN + 60 + int(row[i]) * self.COMP_SPACING_Y + self.COMP_SPACING_Y // 2
+    
+    def _signal_layers(self, names: List[str], pin_comp, pin_net, num_nets: int):
+        """Hops from the nearest V/I source through shared nets (breadth-first)"""
+        n = len(names)
+        layer = np.full(n, -1, dtype=np.int64)
+        sources = [i for i, name in enumerate(names) if self.components[name].type in ('V', 'I')]
+        frontier = np.array(sources or [0], dtype=np.int64)
+        net_seen = np.zeros(num_nets, dtype=bool)
+        depth = 0
+        while len(frontier):
+            layer[frontier] = depth
+            nets = np.unique(pin_net[np.isin(pin_comp, frontier)])
+            nets = nets[~net_seen[nets]]
+            net_seen[nets] = True
+            frontier = np.unique(pin_comp[np.isin(pin_net, nets)])
+            frontier = frontier[layer[frontier] < 0]
+            depth += 1
+        # Parts not reachable from a source go after everything else
+        layer[layer < 0] = depth
+        return layer
+    
+    @staticmethod
+    def _legalize(x, y, rows: int):
+        """Sort components into columns of rows slots by x, then each column by y"""
+        col = np.empty(len(x), dtype=np.int64)
+        col[np.argsort(x, kind='stable')] = np.arange(len(x)) // rows
+        order = np.lexsort((y, col))
+        row = np.empty(len(x), dtype=np.int64)
+        row[order] = np.arange(len(x)) - np.searchsorted(col[order], col[order])
+        return col, row
+    
+    def _grid_layout(self):
         """Calculate component positions using a grid layout"""
         comp_list = sorted(self.components.keys())
         
@@ -332,8 +1002,9 @@ class SchematicRenderer:
         self.height = max(self.height, max_y + self.MARGIN + 50)  # Extra space for legend
     
     def _add_defs(self, root: ET.Element):
-        """Add SVG definitions for markers and gradients"""
-        defs = ET.SubElement(root, 'defs')
+        """Add SVG definitions for markers; component symbols are added as they are used"""
+        defs = self.defs = ET.SubElement(root, 'defs')
+        self.symbols.clear()
         
         # Arrow marker for current sources
         marker = ET.SubElement(defs, 'marker', {
@@ -417,34 +1088,16 @@ class SchematicRenderer:
         """Draw a component symbol with labels"""
         x, y = comp.x, comp.y
         
-        # Create component group
-        g = ET.SubElement(comp_group, 'g', {
+        # Place the shared symbol; xlink:href for SVG 1.1 viewers (Inkscape,
+        # older Safari), href for SVG 2
+        symbol = f'#{self._symbol(comp)}'
+        ET.SubElement(comp_group, 'use', {
             'id': f'comp-{comp.name}',
+            'href': symbol,
+            'xlink:href': symbol,
             'transform': f'translate({x}, {y})'
         })
         
-        # Draw symbol based on type
-        if comp.type == 'R':
-            self._draw_resistor_symbol(g, comp)
-        elif comp.type == 'C':
-            self._draw_capacitor_symbol(g, comp)
-        elif comp.type == 'L':
-            self._draw_inductor_symbol(g, comp)
-        elif comp.type == 'D':
-            self._draw_diode_symbol(g, comp)
-        elif comp.type == 'Q':
-            self._draw_bjt_symbol(g, comp)
-        elif comp.type == 'M':
-            self._draw_mosfet_symbol(g, comp)
-        elif comp.type == 'J':
-            self._draw_jfet_symbol(g, comp)
-        elif comp.type == 'V':
-            self._draw_voltage_source_symbol(g, comp)
-        elif comp.type == 'I':
-            self._draw_current_source_symbol(g, comp)
-        else:
-            self._draw_generic_symbol(g, comp)
-        
         # Add labels in label group (so they appear on top)
         label_g = ET.SubElement(label_group, 'g', {'transform': f'translate({x}, {y})'})
         self._add_component_labels(label_g, comp)
@@ -452,6 +1105,27 @@ class SchematicRenderer:
         # Register port positions for wire routing
         self._register_ports(comp)
     
+    def _symbol(self, comp: Component) -> str:
+        """
+        Id of the component's symbol, drawn into <defs> the first time it is
+        needed, and copy the symbol's port positions onto the component
+        """
+        if comp.type == 'X' and comp.pins:
+            # Blocks differ by their pin list
+            key = ('X',) + tuple(comp.pins)
+            name = f'block-{sum(1 for k in self.symbols if k[0] == "X") + 1}'
+            method = '_draw_subcircuit_symbol'
+        else:
+            name, method = self.SYMBOL_LIBRARY.get(comp.type, self.GENERIC_SYMBOL)
+            key = (name,)
+        if key not in self.symbols:
+            g = ET.SubElement(self.defs, 'g', {'id': f'sym-{name}'})
+            getattr(self, method)(g, comp)
+            self.symbols[key] = (f'sym-{name}', dict(comp.ports))
+        symbol_id, ports = self.symbols[key]
+        comp.ports = dict(ports)
+        return symbol_id
+    
     def _draw_resistor_symbol(self, g: ET.Element, comp: Component):
         """Draw IEEE-style resistor (zigzag)"""
         # Zigzag pattern
@@ -707,8 +1381,7 @@ class SchematicRenderer:
         comp.ports[0] = (60, -35)  # Drain
         comp.ports[1] = (-60, 0)   # Gate
         comp.ports[2] = (60, 35)   # Source
-        if len(comp.nodes) > 3:
-            comp.ports[3] = (60, 35)  # Bulk (tied to source)
+        comp.ports[3] = (60, 35)   # Bulk (tied to source), used when the netlist gives one
     
     def _draw_jfet_symbol(self, g: ET.Element, comp: Component):
         """Draw N-channel JFET symbol"""
@@ -875,6 +1548,32 @@ class SchematicRenderer:
         comp.ports[0] = (-60, 0)
         comp.ports[1] = (60, 0)
     
+    def _draw_subcircuit_symbol(self, g: ET.Element, comp: Component):
+        """Draw a subcircuit instance as a block with its named pins, first half on the left"""
+        left = (len(comp.pins) + 1) // 2
+        rows = max(left, 1)
+        box_w, box_h = 70, rows * 20 + 10
+        
+        ET.SubElement(g, 'rect', {
+            'x': str(-box_w//2),
+            'y': str(-box_h//2),
+            'width': str(box_w),
+            'height': str(box_h),
+            'class': 'symbol'
+        })
+        
+        for pin_idx, pin in enumerate(comp.pins):
+            side = -1 if pin_idx < left else 1
+            row = pin_idx if pin_idx < left else pin_idx - left
+            y = -(rows - 1) * 10 + row * 20
+            ET.SubElement(g, 'line', {
+                'x1': str(side * 60), 'y1': str(y),
+                'x2': str(side * box_w//2), 'y2': str(y),
+                'class': 'wire'
+            })
+            self._add_pin_label(g, side * (box_w//2 - 14), y + 3, pin)
+            comp.ports[pin_idx] = (side * 60, y)
+    
     def _add_pin_label(self, g: ET.Element, x: int, y: int, text: str):
         """Add a pin label"""
         label = ET.SubElement(g, 'text', {
@@ -915,7 +1614,120 @@ class SchematicRenderer:
                 self.node_positions[node].append((abs_x, abs_y, comp.name, pin_idx))
     
     def _draw_all_connections(self, wires_group: ET.Element):
-        """Draw all wire connections between components"""
+        """Route every net around the symbols and draw it as a single path"""
+        router = WireRouter(self.width, self.height,
+                            sum(len(p) for p in self.node_positions.values() if len(p) > 1))
+        self._add_obstacles(router)
+        pitch = router.PITCH
+        
+        # Pin cells are claimed up front so that no wire runs through a port
+        nets = []
+        for node, positions in self.node_positions.items():
+            if len(positions) < 2:
+                continue
+            net = len(nets)
+            pins: Dict[int, List[Tuple[int, int]]] = {}
+            unplaced = []
+            for x, y, comp_name, _ in positions:
+                comp = self.components[comp_name]
+                # Snap off-grid ports towards their symbol; a stub covers the gap
+                cell = router.cell(comp.x + int((x - comp.x) / pitch) * pitch,
+                                   comp.y + int((y - comp.y) / pitch) * pitch)
+                front = cell + (1 if x > comp.x else -1)
+                if cell in pins or router.reserve(cell, front, net):
+                    pins.setdefault(cell, []).append((x, y))
+                else:
+                    unplaced.append((x, y))
+            nets.append((node, positions, pins, unplaced))
+        
+        # Nets with the most pins (supply rails) lay their trunks first, the
+        # rest follow shortest first so local connections get direct tracks
+        def priority(item):
+            _, (_, positions, pins, _) = item
+            xs = [p[0] for p in positions]
+            ys = [p[1] for p in positions]
+            return -len(pins), max(xs) - min(xs) + max(ys) - min(ys)
+        
+        self.unrouted = 0
+        for net, (node, positions, pins, unplaced) in sorted(enumerate(nets), key=priority):
+            cx = sum(p[0] for p in positions) / len(positions)
+            cy = sum(p[1] for p in positions) / len(positions)
+            order = sorted(pins, key=lambda c: abs(router.point(c)[0] - cx) + abs(router.point(c)[1] - cy))
+            branches, failed = router.route_net(net, order) if order else ([], [])
+            for cell in failed:
+                unplaced.extend(pins.pop(cell))
+            self._draw_net(wires_group, router, node, pins, branches, unplaced)
+    
+    def _add_obstacles(self, router: WireRouter):
+        """Stamp symbol bodies, their labels and the title and legend bands into the router grid"""
+        pitch = router.PITCH
+        router.block(0, 0, self.width, self.MARGIN - pitch)
+        router.block(0, self.height - 50, self.width, self.height)
+        for comp in self.components.values():
+            if not comp.ports:
+                continue
+            xs = [p[0] for p in comp.ports.values()]
+            ys = [p[1] for p in comp.ports.values()]
+            # Port columns included: pins are reopened by reserve() and wires leave them outwards
+            router.block(comp.x + min(-60, min(xs)), comp.y + min(-50, min(ys) - pitch),
+                         comp.x + max(60, max(xs)), comp.y + max(50, max(ys) + pitch))
+    
+    def _draw_net(self, wires_group: ET.Element, router: WireRouter, node: str,
+                  pins: Dict[int, List[Tuple[int, int]]], branches: List[List[int]],
+                  unplaced: List[Tuple[int, int]]):
+        """Draw a routed net as one path, with dots where three or more wires meet"""
+        subpaths = []
+        degree: Dict[int, int] = defaultdict(int)
+        for path in branches:
+            points = [router.point(c) for c in path]
+            # Keep only the corners of each branch
+            corners = [points[0]] + [b for a, b, c in zip(points, points[1:], points[2:])
+                                     if (a[0] == b[0]) != (b[0] == c[0])] + [points[-1]]
+            subpaths.append(corners)
+            degree[path[0]] += 1
+            degree[path[-1]] += 1
+            for c in path[1:-1]:
+                degree[c] += 2
+        for cell, ports in pins.items():
+            access = router.point(cell)
+            for port in sorted(set(ports)):
+                degree[cell] += 1
+                if port != access:
+                    subpaths.append([port, access])
+        
+        if subpaths:
+            d = ' '.join('M ' + ' L '.join(f'{x} {y}' for x, y in points) for points in subpaths)
+            ET.SubElement(wires_group, 'path', {'d': d, 'class': 'wire'})
+        
+        junctions = [router.point(c) for c, n in degree.items() if n >= 3]
+        for x, y in junctions:
+            ET.SubElement(wires_group, 'circle', {
+                'cx': str(x),
+                'cy': str(y),
+                'r': str(self.DOT_RADIUS),
+                'class': 'connection-dot'
+            })
+        
+        # Pins the router could not reach keep a direct wire to the net
+        if unplaced:
+            anchor = router.point(next(iter(pins))) if pins else unplaced[0]
+            for x, y in unplaced:
+                if (x, y) != anchor:
+                    self._draw_wire(wires_group, x, y, anchor[0], anchor[1])
+            self.unrouted += len(unplaced) - (anchor in unplaced)
+        
+        distinct = {port for ports in pins.values() for port in ports} | set(unplaced)
+        if len(distinct) > 2 and node.upper() not in self.GROUND_NAMES:
+            x, y = junctions[0] if junctions else (subpaths[0][0] if subpaths else unplaced[0])
+            label = ET.SubElement(wires_group, 'text', {
+                'x': str(x + 8),
+                'y': str(y - 8),
+                'class': 'node-label'
+            })
+            label.text = node
+    
+    def _draw_direct_connections(self, wires_group: ET.Element):
+        """Draw every net as direct wires, multi-pin nets through a bus point"""
         drawn_dots: Set[Tuple[int, int]] = set()
         
         for node, positions in self.node_positions.items():
@@ -923,7 +1735,7 @@ class SchematicRenderer:
                 continue
             
             # Skip ground node visual clutter (just draw dots)
-            is_ground = node.upper() in ['0', 'GND', 'VSS', 'GROUND']
+            is_ground = node.upper() in self.GROUND_NAMES
             
             if len(positions) == 2:
                 # Direct connection between two points
@@ -991,33 +1803,316 @@ class SchematicRenderer:
             })
     
     def _save_svg(self, root: ET.Element, output_file: str):
-        """Save SVG to file with pretty printing"""
-        xml_str = ET.tostring(root, encoding='unicode')
-        
-        # Parse and pretty print
-        try:
-            dom = minidom.parseString(xml_str)
-            pretty_xml = dom.toprettyxml(indent="  ")
-            # Remove extra blank lines
-            lines = [line for line in pretty_xml.split('\n') if line.strip()]
-            # Remove XML declaration (optional)
-            if lines and lines[0].startswith('<?xml'):
-                lines = lines[1:]
-            pretty_xml = '\n'.join(lines)
-        except Exception:
-            pretty_xml = xml_str
-        
+        """Save SVG to file, indented unless indent is None"""
         with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(pretty_xml)
+            write_svg(root, f, self.indent)
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+PROJECTS_DIR = REPO_ROOT / 'assets' / 'images' / 'projects'
+SCHEMATICS_DIR = REPO_ROOT / 'assets' / 'schematics'
+EXAMPLES_DIR = REPO_ROOT / 'scripts' / 'examples'
+
+# Netlist extensions picked up by --watch and --batch, and library extensions
+# whose changes re-render the netlists that include them
+NETLIST_SUFFIXES = {'.cir', '.sp', '.spice', '.net'}
+LIBRARY_SUFFIXES = {'.lib', '.inc', '.mod'}
+
+# JSON report written by --batch unless --report names another file
+BATCH_REPORT = 'spice_to_svg_report.json'
+
+
+def default_output(spice_file: str) -> str:
+    """The input path with its extension replaced by .svg."""
+    if '.' in spice_file:
+        return spice_file.rsplit('.', 1)[0] + '.svg'
+    return spice_file + '.svg'
+
+
+def convert_file(spice_file: str, output_file: str, expand: str = 'block',
+                 layout: str = 'auto', indent: Optional[str] = SVG_INDENT,
+                 route: bool = True) -> Optional[SPICEParser]:
+    """
+    Parse a netlist and render it to output_file. Returns the parser (which
+    lists the files read in .sources), or None if there are no components.
+    """
+    parser = SPICEParser(filepath=spice_file, expand=expand)
+    components, connections = parser.parse()
+    
+    if not components:
+        print(f"✗ Error: No components found in {spice_file}")
+        print("  Make sure the file contains valid SPICE component definitions.")
+        return None
+    
+    print(f"Found {len(components)} components:")
+    for name, comp in sorted(components.items()):
+        node_str = ', '.join(comp.nodes)
+        print(f"  {name:6s} [{comp.type}] {comp.value:12s} nodes: ({node_str})")
+    
+    print(f"\nFound {len(connections)} unique nodes:")
+    for node, conn in sorted(connections.items()):
+        comp_list = ', '.join([f"{c[0]}:{c[1]}" for c in conn.components])
+        print(f"  {node:10s} → {comp_list}")
+    
+    print()
+    
+    # Render schematic
+    renderer = SchematicRenderer(components, connections, parser.title, layout, indent, route)
+    renderer.render(output_file)
+    return parser
+
+
+def schematic_path(spice_file: Path) -> Path:
+    """
+    Where --watch and --batch write a netlist's schematic: files under
+    assets/images/projects/<project>/ go to assets/schematics/<project>/,
+    anything else next to the netlist.
+    """
+    try:
+        return (SCHEMATICS_DIR / spice_file.relative_to(PROJECTS_DIR)).with_suffix('.svg')
+    except ValueError:
+        return Path(default_output(str(spice_file)))
+
+
+def collect_netlists(patterns: List[str]) -> List[Path]:
+    """Expand directories and glob patterns into a sorted list of netlists."""
+    found = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            candidates = path.rglob('*')
+        elif path.is_file() or not glob.has_magic(pattern):
+            # Named explicitly: any extension goes, and a missing file is reported as a failure
+            found.add(path.resolve())
+            continue
+        else:
+            candidates = (Path(p) for p in glob.glob(pattern, recursive=True))
+        for candidate in candidates:
+            if candidate.is_file() and candidate.suffix.lower() in NETLIST_SUFFIXES:
+                found.add(candidate.resolve())
+    return sorted(found)
+
+
+def _batch_worker(spice_file: str, output_file: str, expand: str, layout: str,
+                  indent: Optional[str], route: bool) -> Dict:
+    """Run convert_file() in a pool worker, capturing its console output and any error."""
+    log = io.StringIO()
+    start = time.perf_counter()
+    parser, error = None, None
+    try:
+        Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+        with contextlib.redirect_stdout(log):
+            parser = convert_file(spice_file, output_file, expand, layout, indent, route)
+        if parser is None:
+            error = "No components found"
+    except NetlistError as e:
+        error = str(e)
+    except Exception as e:
+        # A renderer bug on one netlist must not take the batch down with it
+        error = f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - start
+    
+    ok = error is None
+    return {
+        'input': spice_file,
+        'output': output_file,
+        'ok': ok,
+        'seconds': round(elapsed, 4),
+        'components': len(parser.components) if ok else 0,
+        'nodes': len(parser.connections) if ok else 0,
+        'subcircuits': len(parser.subcircuits) if ok else 0,
+        'sources': len(parser.sources) if ok else 0,
+        'size': os.path.getsize(output_file) if ok else 0,
+        'error': error,
+        'warnings': [line[len('Warning: '):] for line in log.getvalue().splitlines()
+                     if line.startswith('Warning: ')],
+        'log': log.getvalue(),
+    }
+
+
+def convert_batch(patterns: List[str], report: Path, workers: Optional[int] = None,
+                  expand: str = 'block', layout: str = 'auto', indent: Optional[str] = SVG_INDENT,
+                  route: bool = True) -> bool:
+    """
+    Render every netlist matched by patterns in a process pool and write a
+    JSON report of per-file timings, counts and errors. Largest netlists are
+    submitted first; a netlist that fails is reported without stopping the rest.
+    """
+    inputs = collect_netlists(patterns)
+    if not inputs:
+        print(f"✗ Error: No {', '.join(sorted(NETLIST_SUFFIXES))} files matched: {' '.join(patterns)}")
+        return False
+    
+    inputs.sort(key=lambda p: p.stat().st_size if p.exists() else 0, reverse=True)
+    jobs = [(str(p), str(schematic_path(p))) for p in inputs]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    
+    print(f"\n{'=' * 60}")
+    print("SPICE to SVG Batch Renderer")
+    print(f"{'=' * 60}")
+    print(f"Files:   {len(jobs)}")
+    print(f"Workers: {workers}\n")
+    
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_batch_worker, src, dst, expand, layout, indent, route) for src, dst in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            mark = '✓' if result['ok'] else '✗'
+            print(f"  {mark} {Path(result['input']).name} ({result['seconds']:.2f}s)")
+            if not result['ok']:
+                print(f"    {result['error']}")
+    wall = time.perf_counter() - start
+    
+    results.sort(key=lambda r: r['input'])
+    print_batch_summary(results, wall)
+    report.parent.mkdir(parents=True, exist_ok=True)
+    with open(report, 'w', encoding='utf-8') as f:
+        json.dump({
+            'generated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'workers': workers,
+            'wall_seconds': round(wall, 4),
+            'rendered': sum(1 for r in results if r['ok']),
+            'failed': sum(1 for r in results if not r['ok']),
+            'files': [{key: value for key, value in r.items() if key != 'log'} for r in results],
+        }, f, indent=2)
+    print(f"Report: {report}")
+    return all(r['ok'] for r in results)
+
+
+def print_batch_summary(results: List[Dict], wall: float) -> None:
+    """Print a per-file table of status, time, component count and output size."""
+    names = [os.path.relpath(r['output']) for r in results]
+    width = max([len(n) for n in names] + [len('Output')])
+    
+    print(f"\n{'Output':<{width}}  {'Status':<6}  {'Time':>8}  {'Parts':>6}  {'Size':>10}")
+    print(f"{'-' * width}  {'-' * 6}  {'-' * 8}  {'-' * 6}  {'-' * 10}")
+    for name, r in zip(names, results):
+        status = 'ok' if r['ok'] else 'FAILED'
+        parts = str(r['components']) if r['ok'] else '-'
+        size = f"{r['size'] / 1024:.1f} KB" if r['ok'] else '-'
+        print(f"{name:<{width}}  {status:<6}  {r['seconds']:>7.2f}s  {parts:>6}  {size:>10}")
+    
+    failed = sum(1 for r in results if not r['ok'])
+    slowest = max((r['seconds'] for r in results), default=0.0)
+    total = sum(r['seconds'] for r in results)
+    print(f"\n{len(results) - failed}/{len(results)} rendered in {wall:.2f}s "
+          f"(slowest file {slowest:.2f}s, sequential total {total:.2f}s)")
+
+
+def watch(directories: List[str], poll: bool = False, expand: str = 'block', layout: str = 'auto',
+          indent: Optional[str] = SVG_INDENT, route: bool = True) -> None:
+    """
+    Re-render netlists under directories whenever they change, until Ctrl+C.
+
+    Runs in one process, so each save only costs the parse and render.
+    Schematics that are missing or older than their netlist are rendered
+    first, then only the netlists that change or that include (.INCLUDE,
+    .LIB) a file that changed.
+    """
+    from file_watch import FileWatcher
+    
+    directories = [d for d in directories if Path(d).is_dir()]
+    if not directories:
+        print("✗ Error: None of the watched directories exist")
+        sys.exit(1)
+    watcher = FileWatcher(directories, NETLIST_SUFFIXES | LIBRARY_SUFFIXES, poll=poll)
+    print(f"Watching {', '.join(directories)} ({watcher.backend}, {len(watcher.files())} files)")
+    print("Press Ctrl+C to stop\n")
+    
+    def stale(path: Path) -> bool:
+        output = schematic_path(path)
+        return not output.exists() or output.stat().st_mtime < path.stat().st_mtime
+    
+    netlists = [p for p in watcher.files() if p.suffix.lower() in NETLIST_SUFFIXES]
+    pending = [p for p in netlists if stale(p)]
+    sources: Dict[Path, Set[Path]] = {}     # netlist -> files its last render read
+    try:
+        while True:
+            for path in pending:
+                output = schematic_path(path)
+                output.parent.mkdir(parents=True, exist_ok=True)
+                start = time.perf_counter()
+                log = io.StringIO()
+                # A broken netlist, or a file deleted mid-save, must not end the watch
+                try:
+                    with contextlib.redirect_stdout(log):
+                        parser = convert_file(str(path), str(output), expand, layout, indent, route)
+                except NetlistError as e:
+                    parser = None
+                    log.write(f"✗ Error: {e}\n")
+                except Exception as e:
+                    parser = None
+                    log.write(f"✗ Error: {type(e).__name__}: {e}\n")
+                if parser is not None:
+                    sources[path] = {Path(source) for source in parser.sources}
+                stamp = time.strftime('%H:%M:%S')
+                if parser is not None:
+                    print(f"[{stamp}] {path.name} → {os.path.relpath(output)}  "
+                          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+                else:
+                    print(f"[{stamp}] {path.name} FAILED\n{log.getvalue().rstrip()}")
+            changed = set(watcher.changes())
+            pending = sorted({p for p in changed if p.suffix.lower() in NETLIST_SUFFIXES} |
+                             {p for p, read in sources.items() if read & changed and p.exists()})
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+    finally:
+        watcher.close()
 
 
 def main():
     """Main entry point"""
-    if len(sys.argv) < 2:
+    # Options that take a value (-j 4, --report=out.json); the rest are switches
+    values: Dict[str, str] = {}
+    argv = iter(sys.argv[1:])
+    remaining = []
+    for arg in argv:
+        name, has_value, value = arg.partition('=')
+        name = {'-j': '--workers'}.get(name, name)
+        if name in ('--workers', '--report'):
+            value = value if has_value else next(argv, None)
+            if value is None:
+                print(f"✗ Error: {name} needs a value")
+                sys.exit(2)
+            values[name] = value
+        else:
+            remaining.append(arg)
+    args = [a for a in remaining if not a.startswith('--')]
+    flags = [a for a in remaining if a.startswith('--')]
+    unknown = [f for f in flags if f not in ('--watch', '--batch', '--poll', '--flatten', '--grid', '--no-route',
+                                          '--minify')]
+    if unknown:
+        print(f"✗ Error: Unknown option {unknown[0]}")
+        sys.exit(2)
+    if not values.get('--workers', '1').isdigit():
+        print(f"✗ Error: --workers must be a number, not {values['--workers']!r}")
+        sys.exit(2)
+    expand = 'flatten' if '--flatten' in flags else 'block'
+    layout = 'grid' if '--grid' in flags else 'auto'
+    indent = None if '--minify' in flags else SVG_INDENT
+    # The grid layout is the fast path, so it keeps direct wires too
+    route = layout == 'auto' and '--no-route' not in flags
+    
+    if '--watch' in flags:
+        watch(args or [str(EXAMPLES_DIR), str(PROJECTS_DIR)], poll='--poll' in flags, expand=expand,
+              layout=layout, indent=indent, route=route)
+        sys.exit(0)
+    
+    if '--batch' in flags:
+        ok = convert_batch(args or [str(EXAMPLES_DIR), str(PROJECTS_DIR)],
+                           Path(values.get('--report', BATCH_REPORT)),
+                           workers=int(values['--workers']) if '--workers' in values else None,
+                           expand=expand, layout=layout, indent=indent, route=route)
+        sys.exit(0 if ok else 1)
+    
+    if not args:
         print("=" * 60)
         print("SPICE to SVG Schematic Generator")
         print("=" * 60)
-        print("\nUsage: python spice_to_svg.py <spice_file> [output_file.svg]")
+        print("\nUsage: python spice_to_svg.py <spice_file> [output_file.svg] [--flatten] [--grid] [--no-route] [--minify]")
         print("\nSupported components:")
         print("  R - Resistor       (R1 node1 node2 value)")
         print("  C - Capacitor      (C1 node1 node2 value)")
@@ -1028,9 +2123,16 @@ def main():
         print("  J - JFET           (J1 D G S model)")
         print("  V - Voltage Source (V1 n+ n- DC value)")
         print("  I - Current Source (I1 n+ n- DC value)")
+        print("  X - Subcircuit     (X1 node... name), drawn as a block or expanded with --flatten")
         print("\nExample:")
         print("  python spice_to_svg.py circuit.cir")
         print("  python spice_to_svg.py circuit.cir schematic.svg")
+        print("  python spice_to_svg.py board.cir --flatten")
+        print("  python spice_to_svg.py board.cir --grid        # fast name-ordered grid, direct wires")
+        print("  python spice_to_svg.py board.cir --no-route    # direct wires instead of routing")
+        print("  python spice_to_svg.py board.cir --minify      # no indentation or line breaks")
+        print("  python spice_to_svg.py --watch [DIR ...] [--poll] [--flatten]")
+        print("  python spice_to_svg.py --batch [PATH ...] [-j N] [--report report.json]")
         print("\nExample SPICE file content:")
         print("  Simple RC Filter")
         print("  V1 IN 0 DC 5V")
@@ -1039,17 +2141,14 @@ def main():
         print("  .END")
         sys.exit(0)
     
-    spice_file = sys.argv[1]
+    spice_file = args[0]
     
     # Determine output filename
-    if len(sys.argv) > 2:
-        output_file = sys.argv[2]
+    if len(args) > 1:
+        output_file = args[1]
     else:
         # Replace extension with .svg
-        if '.' in spice_file:
-            output_file = spice_file.rsplit('.', 1)[0] + '.svg'
-        else:
-            output_file = spice_file + '.svg'
+        output_file = default_output(spice_file)
     
     if not output_file.endswith('.svg'):
         output_file += '.svg'
@@ -1061,31 +2160,13 @@ def main():
     print(f"Output: {output_file}")
     print()
     
-    # Parse SPICE file
-    parser = SPICEParser(filepath=spice_file)
-    components, connections = parser.parse()
-    
-    if not components:
-        print(f"✗ Error: No components found in {spice_file}")
-        print("  Make sure the file contains valid SPICE component definitions.")
+    try:
+        if convert_file(spice_file, output_file, expand, layout, indent, route) is None:
+            sys.exit(1)
+    except NetlistError as e:
+        print(f"Error: {e}")
         sys.exit(1)
     
-    print(f"Found {len(components)} components:")
-    for name, comp in sorted(components.items()):
-        node_str = ', '.join(comp.nodes)
-        print(f"  {name:6s} [{comp.type}] {comp.value:12s} nodes: ({node_str})")
-    
-    print(f"\nFound {len(connections)} unique nodes:")
-    for node, conn in sorted(connections.items()):
-        comp_list = ', '.join([f"{c[0]}:{c[1]}" for c in conn.components])
-        print(f"  {node:10s} → {comp_list}")
-    
-    print()
-    
-    # Render schematic
-    renderer = SchematicRenderer(components, connections, parser.title)
-    renderer.render(output_file)
-    
     print(f"\n{'=' * 60}\n")
 
 
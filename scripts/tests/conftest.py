@@ -0,0 +1,6 @@
+"""Make the converters importable from the tests as top-level modules."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,38 @@
+"""
+Tests for benchmark_cad_to_gltf.py.
+
+Run from the repository root with:  python -m pytest scripts/tests
+"""
+
+import benchmark_cad_to_gltf
+
+
+def _results(**machine):
+    document = {
+        'machine': {'platform': 'Linux-6.1.0-x86_64-with-glibc2.36', 'processor': 'x86_64', 'cpu_count': 4,
+                    'python': '3.11.7', 'numpy': '2.4.6', 'trimesh': '5.1.1'},
+        'results': {},
+    }
+    document['machine'].update(machine)
+    return document
+
+
+def test_same_machine_across_kernel_builds():
+    baseline = _results()
+    current = _results(platform='Linux-6.8.0-x86_64-with-glibc2.39')
+    assert benchmark_cad_to_gltf.machine_differences(current, baseline) == []
+
+
+def test_machine_differences_are_listed():
+    baseline = _results()
+    current = _results(cpu_count=16, numpy='2.5.0')
+    assert benchmark_cad_to_gltf.machine_differences(current, baseline) == [
+        'cpu_count: 4 → 16', 'numpy: 2.4.6 → 2.5.0',
+    ]
+
+
+def test_baseline_without_machine_details_differs():
+    baseline = _results()
+    del baseline['machine']
+    assert len(benchmark_cad_to_gltf.machine_differences(_results(), baseline)) == len(
+        benchmark_cad_to_gltf.MACHINE_FIELDS)
@@ -0,0 +1,1000 @@
+"""
+Tests for cad_to_gltf.py.
+
+Run from the repository root with:  python -m pytest scripts/tests
+"""
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import zipfile
+
+import numpy as np
+import pytest
+import trimesh
+
+import cad_to_gltf
+
+
+def _write_binary_stl(path, triangles, header=b'', count=None, trailing=b''):
+    """Write (n, 3, 3) triangles as a binary STL with a chosen header and facet count."""
+    facets = np.zeros(len(triangles), dtype=cad_to_gltf.STL_BINARY_DTYPE)
+    facets['vertices'] = triangles
+    with open(path, 'wb') as f:
+        f.write(header.ljust(80, b' ')[:80])
+        f.write(int(len(triangles) if count is None else count).to_bytes(4, 'little'))
+        f.write(facets.tobytes())
+        f.write(trailing)
+
+
+def _write_ascii_stl(path, triangles):
+    lines = ['solid test']
+    for triangle in triangles:
+        lines += ['  facet normal 0 0 0', '    outer loop']
+        lines += [f'      vertex {x!r} {y!r} {z!r}' for x, y, z in triangle.tolist()]
+        lines += ['    endloop', '  endfacet']
+    lines.append('endsolid test')
+    path.write_text('\n'.join(lines) + '\n')
+
+
+@pytest.fixture
+def box_triangles():
+    """The 12 triangles of a unit box; its coordinates are exact in float32."""
+    box = trimesh.creation.box()
+    return np.asarray(box.vertices, dtype=np.float32)[box.faces]
+
+
+# =============================================================================
+# Meshopt codec
+# =============================================================================
+
+@pytest.mark.parametrize('count, stride', [
+    (1, 4), (15, 4), (16, 8), (257, 12), (1000, 16), (5000, 8), (70000, 8),
+])
+def test_meshopt_vertices_decode_with_reference(count, stride):
+    meshoptimizer = pytest.importorskip('meshoptimizer')
+    rng = np.random.default_rng(count)
+    # Smooth lanes exercise the 0/2/4-bit groups, noisy ones the 8-bit path
+    data = np.cumsum(rng.integers(0, 3, (count, stride)), axis=0).astype(np.uint8)
+    data[:, ::3] = rng.integers(0, 256, (count, len(range(0, stride, 3))))
+    
+    encoded = cad_to_gltf.meshopt_encode_vertices(data)
+    decoded = meshoptimizer.decode_vertex_buffer(count, stride, encoded)
+    assert np.array_equal(np.ascontiguousarray(decoded).view(np.uint8).reshape(count, stride), data)
+
+
+def test_meshopt_vertices_reject_bad_stride():
+    with pytest.raises(ValueError):
+        cad_to_gltf.meshopt_encode_vertices(np.zeros((4, 6), dtype=np.uint8))
+
+
+@pytest.mark.parametrize('mesh', [
+    trimesh.creation.box(),
+    trimesh.creation.icosphere(subdivisions=4),
+    trimesh.creation.torus(1.0, 0.3, major_sections=64, minor_sections=32),
+], ids=['box', 'icosphere', 'torus'])
+def test_meshopt_triangles_decode_with_reference(mesh):
+    meshoptimizer = pytest.importorskip('meshoptimizer')
+    indices = np.asarray(mesh.faces, dtype=np.uint32).ravel()
+    
+    encoded = cad_to_gltf.meshopt_encode_triangles(indices)
+    decoded = np.asarray(meshoptimizer.decode_index_buffer(len(indices), 4, encoded))
+    
+    # The codec may rotate a triangle but keeps its winding and the order of triangles
+    def canonical(triangles):
+        triangles = triangles.reshape(-1, 3)
+        shift = np.argmin(triangles, axis=1)
+        return np.take_along_axis(triangles, (shift[:, None] + np.arange(3)) % 3, axis=1)
+    
+    assert np.array_equal(canonical(decoded.astype(np.int64)), canonical(indices.astype(np.int64)))
+
+
+# =============================================================================
+# STL loading
+# =============================================================================
+
+def _assert_box(mesh, triangles):
+    assert len(mesh.vertices) == 8
+    assert np.array_equal(np.asarray(mesh.vertices)[mesh.faces], triangles)
+
+
+def test_binary_stl(tmp_path, box_triangles):
+    path = tmp_path / 'box.stl'
+    _write_binary_stl(path, box_triangles)
+    assert cad_to_gltf._binary_stl_count(path) == 12
+    _assert_box(cad_to_gltf.load_stl(path), box_triangles)
+
+
+def test_ascii_stl(tmp_path, box_triangles):
+    path = tmp_path / 'box.stl'
+    _write_ascii_stl(path, box_triangles)
+    assert cad_to_gltf._binary_stl_count(path) is None
+    assert cad_to_gltf._is_ascii_stl(path)
+    _assert_box(cad_to_gltf.load_stl(path, chunk_triangles=5), box_triangles)
+
+
+def test_binary_stl_with_solid_header(tmp_path, box_triangles):
+    path = tmp_path / 'box.stl'
+    _write_binary_stl(path, box_triangles, header=b'solid exported by a binary writer')
+    assert not cad_to_gltf._is_ascii_stl(path)
+    _assert_box(cad_to_gltf.load_stl(path), box_triangles)
+
+
+@pytest.mark.parametrize('count, trailing', [
+    (0, b''),           # Left at zero by a streaming exporter
+    (1000, b''),        # Larger than the file
+    (12, b'\0' * 7),    # Padding after the last facet
+], ids=['zero-count', 'overstated-count', 'trailing-bytes'])
+def test_binary_stl_with_wrong_size(tmp_path, box_triangles, count, trailing):
+    path = tmp_path / 'box.stl'
+    _write_binary_stl(path, box_triangles, header=b'solid', count=count, trailing=trailing)
+    assert cad_to_gltf._binary_stl_count(path) is None
+    assert cad_to_gltf._binary_stl_count(path, exact=False) == 12
+    _assert_box(cad_to_gltf.load_stl(path), box_triangles)
+
+
+def test_binary_stl_understated_count(tmp_path, box_triangles):
+    path = tmp_path / 'box.stl'
+    _write_binary_stl(path, box_triangles, count=4)
+    assert cad_to_gltf._binary_stl_count(path, exact=False) == 4
+    assert len(cad_to_gltf.load_stl(path).faces) == 4
+
+
+def test_unreadable_stl_is_an_error(tmp_path):
+    path = tmp_path / 'broken.stl'
+    path.write_bytes(b'not a mesh')
+    with pytest.raises(ValueError):
+        cad_to_gltf.load_stl(path)
+
+
+# =============================================================================
+# OBJ, PLY and 3MF
+# =============================================================================
+
+# A unit square as a quad and a triangle fan around it
+_SQUARE = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [0.5, 0.5, 1]], dtype=np.float64)
+_SQUARE_FACES = np.array([[0, 1, 2], [0, 2, 3], [0, 1, 4], [1, 2, 4], [2, 3, 4]])
+
+
+def test_obj(tmp_path):
+    path = tmp_path / 'square.obj'
+    path.write_bytes(b'\r\n'.join([
+        b'# comment', b'mtllib square.mtl', b'o square',
+        b'v 0 0 0', b'v 1 0 0 1.0', b'v 1 1 0', b'v 0 1 0 0.2 0.3 0.4',
+        b'vt 0 0', b'vn 0 0 1', b'usemtl steel',
+        b'f 1/1/1 2/1/1 3/1/1 4/1/1',
+        b'v 0.5 0.5 1',
+        b'f -5//1 -4//1 -1//1', b'f 2 3 5', b'f\t3 4 5', b'l 1 2', b'',
+    ]))
+    mesh = cad_to_gltf.load_obj(path)
+    assert np.array_equal(mesh.vertices, _SQUARE)
+    assert np.array_equal(mesh.faces, _SQUARE_FACES)
+
+
+def test_obj_with_missing_vertex_is_an_error(tmp_path):
+    path = tmp_path / 'broken.obj'
+    path.write_text('v 0 0 0\nv 1 0 0\nf 1 2 3\n')
+    with pytest.raises(ValueError, match='missing vertices'):
+        cad_to_gltf.load_obj(path)
+
+
+def _ply_header(encoding, faces):
+    return (f'ply\nformat {encoding} 1.0\ncomment test\n'
+            f'element vertex {len(_SQUARE)}\nproperty float x\nproperty float y\nproperty float z\n'
+            f'property uchar red\n'
+            f'element face {faces}\nproperty list uchar int vertex_indices\n'
+            f'element edge 1\nproperty int vertex1\nproperty int vertex2\nend_header\n').encode()
+
+
+@pytest.mark.parametrize('polygons', [
+    [[0, 1, 2, 3], [0, 1, 4], [1, 2, 4], [2, 3, 4]],   # read row by row
+    [[0, 1, 2], [0, 2, 3], [0, 1, 4], [1, 2, 4], [2, 3, 4]],   # read as one table
+])
+@pytest.mark.parametrize('encoding', ['ascii', 'binary_little_endian', 'binary_big_endian'])
+def test_ply(tmp_path, encoding, polygons):
+    path = tmp_path / 'square.ply'
+    if encoding == 'ascii':
+        body = ''.join(f'{x} {y} {z} 255\n' for x, y, z in _SQUARE.tolist())
+        body += ''.join(f'{len(p)} {" ".join(map(str, p))}\n' for p in polygons) + '0 1\n'
+        path.write_bytes(_ply_header(encoding, len(polygons)) + body.encode())
+    else:
+        order = '<' if encoding == 'binary_little_endian' else '>'
+        vertices = np.zeros(len(_SQUARE), dtype=[('xyz', f'{order}f4', 3), ('red', 'u1')])
+        vertices['xyz'] = _SQUARE
+        body = vertices.tobytes()
+        for polygon in polygons:
+            body += bytes([len(polygon)]) + np.array(polygon, dtype=f'{order}i4').tobytes()
+        body += np.array([0, 1], dtype=f'{order}i4').tobytes()
+        path.write_bytes(_ply_header(encoding, len(polygons)) + body)
+    
+    mesh = cad_to_gltf.load_ply(path)
+    assert np.array_equal(mesh.vertices, _SQUARE)
+    assert np.array_equal(mesh.faces, _SQUARE_FACES)
+
+
+@pytest.mark.parametrize('encoding', ['ascii', 'binary'])
+def test_ply_matches_trimesh(tmp_path, encoding):
+    path = tmp_path / 'sphere.ply'
+    path.write_bytes(trimesh.exchange.ply.export_ply(trimesh.creation.icosphere(3), encoding=encoding))
+    mesh = cad_to_gltf.load_ply(path)
+    reference = trimesh.load(path, force='mesh', process=False)
+    assert np.array_equal(mesh.vertices, reference.vertices)
+    assert np.array_equal(mesh.faces, reference.faces)
+
+
+def test_truncated_ply_is_an_error(tmp_path):
+    path = tmp_path / 'short.ply'
+    path.write_bytes(_ply_header('binary_little_endian', 2) + b'\0' * 20)
+    with pytest.raises(ValueError, match='ends early'):
+        cad_to_gltf.load_ply(path)
+
+
+def _write_3mf(path, unit='millimeter'):
+    """A 3MF placing a box twice directly and once through a component. Returns the box."""
+    box = trimesh.creation.box()
+    vertices = ''.join(f'<vertex x="{x}" y="{y}" z="{z}"/>' for x, y, z in box.vertices.tolist())
+    triangles = ''.join(f'<triangle v1="{a}" v2="{b}" v3="{c}"/>' for a, b, c in box.faces.tolist())
+    model = (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<model unit="{unit}" xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">'
+        f'<resources>'
+        f'<object id="1" name="box" type="model"><mesh><vertices>{vertices}</vertices>'
+        f'<triangles>{triangles}</triangles></mesh></object>'
+        f'<object id="2" name="raised" type="model"><components>'
+        f'<component objectid="1" transform="1 0 0 0 1 0 0 0 1 0 0 5"/></components></object>'
+        f'</resources>'
+        f'<build><item objectid="1" transform="1 0 0 0 1 0 0 0 1 10 0 0"/>'
+        f'<item objectid="1"/><item objectid="2"/></build></model>'
+    )
+    rels = ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Target="/3D/3dmodel.model" Id="rel0" '
+            'Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/></Relationships>')
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('_rels/.rels', rels)
+        archive.writestr('3D/3dmodel.model', model)
+    return box
+
+
+@pytest.mark.parametrize('unit, scale', [('millimeter', 1.0), ('inch', 25.4)])
+def test_3mf_keeps_build_items_as_instances(tmp_path, unit, scale):
+    box = _write_3mf(tmp_path / 'plate.3mf', unit)
+    scene = cad_to_gltf.load_3mf(tmp_path / 'plate.3mf')
+    
+    assert list(scene.geometry) == ['box']
+    assert np.allclose(scene.geometry['box'].vertices, box.vertices)
+    assert np.array_equal(scene.geometry['box'].faces, box.faces)
+    assert len(scene.graph.nodes_geometry) == 3
+    offsets = sorted(scene.graph[node][0][:3, 3].tolist() for node in scene.graph.nodes_geometry)
+    assert np.allclose(offsets, np.array([[0, 0, 0], [0, 0, 5], [10, 0, 0]]) * scale)
+
+
+@pytest.mark.parametrize('name', ['square.obj', 'square.ply', 'plate.3mf'])
+def test_mesh_formats_convert(tmp_path, name):
+    path = tmp_path / name
+    if name.endswith('.3mf'):
+        _write_3mf(path)
+    elif name.endswith('.obj'):
+        path.write_text(''.join(f'v {x} {y} {z}\n' for x, y, z in _SQUARE.tolist())
+                        + ''.join(f'f {a + 1} {b + 1} {c + 1}\n' for a, b, c in _SQUARE_FACES.tolist()))
+    else:
+        path.write_bytes(trimesh.exchange.ply.export_ply(trimesh.Trimesh(_SQUARE, _SQUARE_FACES)))
+    output = tmp_path / 'out.glb'
+    
+    assert cad_to_gltf.convert(str(path), str(output), use_cache=False)
+    assert len(trimesh.load(output).triangles) == (36 if name.endswith('.3mf') else 5)
+
+
+# =============================================================================
+# Vertex welding
+# =============================================================================
+
+@pytest.fixture
+def soup():
+    """Triangles over a small vertex pool, with signed zeros and near-duplicates mixed in."""
+    rng = np.random.default_rng(7)
+    pool = (rng.integers(-50, 50, (1500, 3)) * 0.01).astype(np.float32)
+    pool[:20] = -pool[:20] * 0       # -0.0 must weld with 0.0
+    near = pool[:500] + rng.normal(0, 1e-6, (500, 3)).astype(np.float32)
+    pool = np.concatenate([pool, near])
+    return pool[rng.integers(0, len(pool), (4000, 3))]
+
+
+def _chunks(triangles, size=700):
+    return (triangles[start:start + size] for start in range(0, len(triangles), size))
+
+
+@pytest.mark.parametrize('tolerance', [0.0, 1e-4])
+@pytest.mark.parametrize('workers', [1, 2])
+def test_weld_out_of_core_matches_in_memory(soup, tolerance, workers):
+    vertices, faces = cad_to_gltf._weld_triangle_chunks(_chunks(soup), len(soup), tolerance)
+    # A budget this small forces many partitions
+    budget = len(soup) * 3 * 8
+    ooc_vertices, ooc_faces = cad_to_gltf.weld_out_of_core(_chunks(soup), 3 * len(soup), budget,
+                                                           workers, tolerance)
+    assert np.array_equal(ooc_vertices, vertices)
+    assert np.array_equal(ooc_faces, faces)
+    # Welding never moves a corner: the first vertex of each group stands for the rest
+    assert np.allclose(vertices[faces], soup, rtol=0, atol=tolerance)
+
+
+def test_weld_tolerance_merges_near_duplicates(soup):
+    exact, _ = cad_to_gltf._weld_triangle_chunks(_chunks(soup), len(soup))
+    welded, _ = cad_to_gltf._weld_triangle_chunks(_chunks(soup), len(soup), 1e-4)
+    assert len(np.unique(soup.reshape(-1, 3), axis=0)) == len(exact) > len(welded)
+
+
+def test_weld_matches_unknown_count(soup):
+    known = cad_to_gltf._weld_triangle_chunks(_chunks(soup), len(soup))
+    unknown = cad_to_gltf._weld_triangle_chunks(_chunks(soup))
+    assert all(np.array_equal(a, b) for a, b in zip(known, unknown))
+
+
+# =============================================================================
+# Conversion cache
+# =============================================================================
+
+def _entries(cache):
+    return sorted(p.name for p in cache.root.glob('??/*') if p.is_dir() and not p.name.startswith('.'))
+
+
+def test_convert_does_not_cache_by_default(tmp_path, box_triangles):
+    _write_binary_stl(tmp_path / 'box.stl', box_triangles)
+    cache = cad_to_gltf.ConversionCache(tmp_path / 'cache')
+    assert cad_to_gltf.convert(str(tmp_path / 'box.stl'), str(tmp_path / 'box.glb'), cache)
+    assert not (tmp_path / 'cache').exists()
+
+
+def test_cache_key_follows_input_and_options(tmp_path, box_triangles):
+    source = tmp_path / 'box.stl'
+    _write_binary_stl(source, box_triangles)
+    cache = cad_to_gltf.ConversionCache(tmp_path / 'cache')
+    options = cad_to_gltf.ConversionOptions()
+    
+    def key(options=options, output='box.glb'):
+        return cache.key(source, tmp_path / output, options.cache_key())
+    
+    original = key()
+    assert key() == original
+    # Execution-only settings don't change the output
+    assert key(cad_to_gltf.ConversionOptions(step_workers=3, parallel_mesh=False)) == original
+    assert key(cad_to_gltf.ConversionOptions(normals=True)) != original
+    assert key(cad_to_gltf.ConversionOptions(max_triangles=6)) != original
+    assert key(output='box.gltf') != original
+    _write_binary_stl(source, box_triangles[::-1])
+    assert key() != original
+
+
+def test_convert_reuses_cached_output_until_input_changes(tmp_path, box_triangles):
+    source, output = tmp_path / 'box.stl', tmp_path / 'out' / 'box.glb'
+    _write_binary_stl(source, box_triangles)
+    cache = cad_to_gltf.ConversionCache(tmp_path / 'cache')
+    
+    assert cad_to_gltf.convert(str(source), str(output), cache, use_cache=True)
+    first = output.read_bytes()
+    output.unlink()
+    assert cad_to_gltf.convert(str(source), str(output), cache, use_cache=True)
+    assert output.read_bytes() == first
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
+    
+    _write_binary_stl(source, box_triangles[:6])
+    assert cad_to_gltf.convert(str(source), str(output), cache, use_cache=True)
+    assert len(trimesh.load(output, force='mesh').faces) == 6
+    assert cache.stats()['entries'] == 2
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = cad_to_gltf.ConversionCache(tmp_path / 'cache', max_bytes=250)
+    files = {}
+    for name in 'abc':
+        files[name] = tmp_path / f'{name}.glb'
+        files[name].write_bytes(name.encode() * 100)
+    key = {name: name * 64 for name in 'abc'}
+    
+    cache.store(key['a'], [files['a']])
+    cache.store(key['b'], [files['b']])
+    for age, name in enumerate('ab'):
+        os.utime(cache.root / key[name][:2] / key[name], (1000 + age, 1000 + age))
+    # A hit makes 'a' the most recently used, so storing 'c' evicts 'b'
+    assert cache.restore(key['a'], tmp_path / 'restored') == [tmp_path / 'restored' / 'a.glb']
+    cache.store(key['c'], [files['c']])
+    
+    assert _entries(cache) == [key['a'], key['c']]
+    assert cache.restore(key['b'], tmp_path / 'restored') is None
+    assert cache.stats()['bytes'] == 200
+
+
+# =============================================================================
+# Batch mode
+# =============================================================================
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_batch_isolates_failures(tmp_path, box_triangles, workers):
+    inputs = tmp_path / 'parts'
+    inputs.mkdir()
+    _write_binary_stl(inputs / 'box.stl', box_triangles)
+    _write_ascii_stl(inputs / 'ascii_box.stl', box_triangles)
+    (inputs / 'broken.stl').write_bytes(b'not a mesh')
+    out = tmp_path / 'models'
+    
+    ok = cad_to_gltf.convert_batch([str(inputs)], out, workers=workers, use_cache=False)
+    
+    assert not ok
+    assert (out / 'parts' / 'box.glb').is_file()
+    assert (out / 'parts' / 'ascii_box.glb').is_file()
+    assert not (out / 'parts' / 'broken.glb').exists()
+    assert len(trimesh.load(out / 'parts' / 'box.glb', force='mesh').faces) == 12
+
+
+def test_batch_refuses_colliding_outputs(tmp_path, box_triangles):
+    inputs = tmp_path / 'parts'
+    inputs.mkdir()
+    _write_binary_stl(inputs / 'box.stl', box_triangles)
+    trimesh.creation.box().export(inputs / 'box.obj')
+    jobs = [(str(p), str(cad_to_gltf.batch_output_path(p, tmp_path / 'models')))
+            for p in sorted(inputs.iterdir())]
+    assert list(cad_to_gltf.output_collisions(jobs).values()) == [[str(inputs / 'box.obj'),
+                                                                   str(inputs / 'box.stl')]]
+    
+    assert not cad_to_gltf.convert_batch([str(inputs)], tmp_path / 'models', workers=1, use_cache=False)
+    assert not (tmp_path / 'models').exists()
+
+
+# =============================================================================
+# Profiling
+# =============================================================================
+
+STAGE_FIELDS = {'name', 'depth', 'start', 'wall', 'cpu', 'peak_rss', 'peak_rss_workers'}
+
+
+def _profiled_conversion(tmp_path, box_triangles):
+    _write_binary_stl(tmp_path / 'box.stl', box_triangles)
+    profiler = cad_to_gltf.Profiler('box.stl')
+    assert cad_to_gltf.convert(str(tmp_path / 'box.stl'), str(tmp_path / 'box.glb'), profiler=profiler)
+    return profiler
+
+
+def test_profile_json_schema(tmp_path, box_triangles):
+    profiler = _profiled_conversion(tmp_path, box_triangles)
+    cad_to_gltf.write_profile([profiler], tmp_path / 'profile.json')
+    
+    data = json.loads((tmp_path / 'profile.json').read_text())
+    assert data['converter_version'] == cad_to_gltf.CONVERTER_VERSION
+    [entry] = data['files']
+    assert (entry['input'], entry['pid']) == ('box.stl', os.getpid())
+    stages = {stage['name']: stage for stage in entry['stages']}
+    assert {'load', 'optimize', 'reorder', 'export'} <= set(stages)
+    for stage in entry['stages']:
+        assert STAGE_FIELDS <= set(stage)
+        assert stage['wall'] >= 0 and stage['cpu'] >= 0 and stage['peak_rss'] > 0
+    assert stages['load']['faces'] == 12
+    assert (stages['load']['depth'], stages['reorder']['depth']) == (0, 1)
+    # Stages are listed in the order they started, nested ones inside their parent
+    starts = [stage['start'] for stage in entry['stages']]
+    assert starts == sorted(starts)
+    optimize, reorder = stages['optimize'], stages['reorder']
+    assert optimize['start'] <= reorder['start']
+    assert reorder['start'] + reorder['wall'] <= optimize['start'] + optimize['wall'] + 1e-3
+
+
+def test_profile_chrome_trace_schema(tmp_path, box_triangles):
+    inputs = tmp_path / 'parts'
+    inputs.mkdir()
+    _write_binary_stl(inputs / 'box.stl', box_triangles)
+    _write_ascii_stl(inputs / 'ascii_box.stl', box_triangles)
+    trace = tmp_path / 'trace.json'
+    assert cad_to_gltf.convert_batch([str(inputs)], tmp_path / 'models', workers=1,
+                                     profile=trace, profile_format='chrome')
+    
+    data = json.loads(trace.read_text())
+    assert data['displayTimeUnit'] == 'ms'
+    metadata = [event for event in data['traceEvents'] if event['ph'] == 'M']
+    complete = [event for event in data['traceEvents'] if event['ph'] == 'X']
+    assert len(data['traceEvents']) == len(metadata) + len(complete)
+    # One named track per converted file
+    assert sorted(event['args']['name'] for event in metadata) == sorted(str(p) for p in inputs.iterdir())
+    assert sorted(event['tid'] for event in metadata) == [0, 1]
+    for event in complete:
+        assert {'name', 'cat', 'ts', 'dur', 'pid', 'tid', 'args'} <= set(event)
+        assert isinstance(event['ts'], int) and isinstance(event['dur'], int) and event['dur'] >= 0
+        assert {'cpu', 'peak_rss'} <= set(event['args'])
+        assert not {'name', 'depth', 'start', 'wall'} & set(event['args'])
+    for track in (0, 1):
+        names = [event['name'] for event in complete if event['tid'] == track]
+        assert {'load', 'optimize', 'export'} <= set(names)
+
+
+# =============================================================================
+# Lazy imports
+# =============================================================================
+
+SCRIPT = cad_to_gltf.__file__
+HEAVY_MODULES = ('numpy', 'trimesh', 'OCP', 'OCC')
+
+
+def _imported_by_cli(*argv):
+    """Run the command line in a fresh interpreter; returns (exit code, heavy modules it imported)."""
+    code = (
+        "import json, runpy, sys\n"
+        f"sys.argv = ['cad_to_gltf.py', *{list(map(str, argv))!r}]\n"
+        "try:\n"
+        f"    runpy.run_path({SCRIPT!r}, run_name='__main__')\n"
+        "    status = 0\n"
+        "except SystemExit as e:\n"
+        "    status = e.code or 0\n"
+        f"print(json.dumps([status, sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)]))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    status, modules = json.loads(result.stdout.splitlines()[-1])
+    return status, modules
+
+
+@pytest.mark.parametrize('argv', [['--help'], ['--check-step']])
+def test_cli_does_not_import_heavy_modules(argv):
+    status, modules = _imported_by_cli(*argv)
+    assert status in (0, 1)
+    assert modules == []
+
+
+def test_cache_hit_does_not_import_heavy_modules(tmp_path, box_triangles):
+    _write_binary_stl(tmp_path / 'box.stl', box_triangles)
+    cache = cad_to_gltf.ConversionCache(tmp_path / 'cache')
+    assert cad_to_gltf.convert(str(tmp_path / 'box.stl'), str(tmp_path / 'first.glb'), cache, use_cache=True)
+    
+    status, modules = _imported_by_cli('-i', tmp_path / 'box.stl', '-o', tmp_path / 'out' / 'first.glb',
+                                       '--cache-dir', tmp_path / 'cache')
+    assert (status, modules) == (0, [])
+    assert (tmp_path / 'out' / 'first.glb').read_bytes() == (tmp_path / 'first.glb').read_bytes()
+    assert cache.stats()['hits'] == 1
+
+
+# =============================================================================
+# Watch mode
+# =============================================================================
+
+# Longest a test waits for the watcher before failing instead of hanging
+WATCH_TIMEOUT = 30.0
+
+
+def _start_watch(*argv):
+    """Start --watch in a subprocess; returns it and a list that collects its output lines."""
+    process = subprocess.Popen([sys.executable, '-u', SCRIPT, '--watch', *map(str, argv)],
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    lines = []
+    threading.Thread(target=lambda: lines.extend(process.stdout), daemon=True).start()
+    return process, lines
+
+
+def _wait_for(lines, text, count=1):
+    """Wait until count output lines contain text."""
+    deadline = time.monotonic() + WATCH_TIMEOUT
+    while sum(text in line for line in lines) < count:
+        assert time.monotonic() < deadline, f"no {text!r} after {WATCH_TIMEOUT}s:\n{''.join(lines)}"
+        time.sleep(0.05)
+
+
+def _stop_watch(process, lines):
+    process.send_signal(signal.SIGINT)
+    assert process.wait(WATCH_TIMEOUT) == 0
+    _wait_for(lines, 'Stopped watching')
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='needs SIGINT')
+def test_watch_reconverts_changed_files(tmp_path, box_triangles):
+    parts = tmp_path / 'parts'
+    parts.mkdir()
+    _write_binary_stl(parts / 'box.stl', box_triangles)
+    output = tmp_path / 'models' / 'parts' / 'box.glb'
+    
+    process, lines = _start_watch(parts, '--poll', '--no-cache', '--output-dir', tmp_path / 'models')
+    try:
+        _wait_for(lines, 'box.stl →')
+        assert len(trimesh.load(output, force='mesh').faces) == 12
+        _write_binary_stl(parts / 'box.stl', box_triangles[:6])
+        _wait_for(lines, 'box.stl →', count=2)
+        assert len(trimesh.load(output, force='mesh').faces) == 6
+        # A broken save is reported and the watch carries on
+        (parts / 'box.stl').write_bytes(b'not a mesh')
+        _wait_for(lines, 'box.stl FAILED')
+        _write_binary_stl(parts / 'box.stl', box_triangles)
+        _wait_for(lines, 'box.stl →', count=3)
+        assert len(trimesh.load(output, force='mesh').faces) == 12
+    finally:
+        if process.poll() is None:
+            _stop_watch(process, lines)
+    assert '(polling, 1 files)' in lines[0]
+
+
+# =============================================================================
+# STEP
+# =============================================================================
+
+@pytest.fixture
+def step_solids(tmp_path):
+    """A STEP file with a box, a moved copy sharing its faces, a cylinder and a sphere."""
+    pytest.importorskip('OCP')
+    from OCP.BRep import BRep_Builder
+    from OCP.BRepPrimAPI import BRepPrimAPI_MakeBox, BRepPrimAPI_MakeCylinder, BRepPrimAPI_MakeSphere
+    from OCP.gp import gp_Ax1, gp_Ax2, gp_Dir, gp_Pnt, gp_Trsf, gp_Vec
+    from OCP.STEPControl import STEPControl_AsIs, STEPControl_Writer
+    from OCP.TopLoc import TopLoc_Location
+    from OCP.TopoDS import TopoDS_Compound
+    
+    compound = TopoDS_Compound()
+    builder = BRep_Builder()
+    builder.MakeCompound(compound)
+    box = BRepPrimAPI_MakeBox(10.0, 20.0, 5.0).Shape()
+    moved = gp_Trsf()
+    moved.SetRotation(gp_Ax1(gp_Pnt(0, 0, 0), gp_Dir(1, 1, 1)), 0.7)
+    moved.SetTranslationPart(gp_Vec(-25.3, 7.1, 3.9))
+    builder.Add(compound, box)
+    builder.Add(compound, box.Moved(TopLoc_Location(moved)))
+    builder.Add(compound, BRepPrimAPI_MakeCylinder(gp_Ax2(gp_Pnt(30, 0, 0), gp_Dir(0, 0, 1)), 4.0, 12.0).Shape())
+    builder.Add(compound, BRepPrimAPI_MakeSphere(gp_Pnt(0, 40, 0), 6.0).Shape())
+    path = tmp_path / 'solids.step'
+    writer = STEPControl_Writer()
+    writer.Transfer(compound, STEPControl_AsIs)
+    assert writer.Write(str(path)) == 1
+    return path
+
+
+def _reference_extraction(occ, shape):
+    """The original per-node extraction, moving each gp_Pnt by its face location."""
+    vertices, faces = [], []
+    explorer = occ.TopExp_Explorer(shape, occ.TopAbs_FACE)
+    while explorer.More():
+        location = occ.TopLoc_Location()
+        tri = occ.triangulation(occ.to_face(explorer.Current()), location)
+        if tri:
+            offset = len(vertices)
+            for i in range(1, tri.NbNodes() + 1):
+                node = tri.Node(i)
+                if not location.IsIdentity():
+                    node = node.Transformed(location.Transformation())
+                vertices.append([node.X(), node.Y(), node.Z()])
+            faces += [[n - 1 + offset for n in tri.Triangle(i).Get()] for i in range(1, tri.NbTriangles() + 1)]
+        explorer.Next()
+    return np.array(vertices), np.array(faces)
+
+
+def test_triangulation_matches_reference_extraction(step_solids):
+    _, occ = cad_to_gltf._occ()
+    shape = cad_to_gltf._read_step(occ, step_solids)
+    cad_to_gltf._tessellate(occ, shape, 0.1, 0.5)
+    
+    # The moved box's faces carry a rotation, which must not cost any precision
+    explorer = occ.TopExp_Explorer(shape, occ.TopAbs_FACE)
+    located = 0
+    while explorer.More():
+        located += not explorer.Current().Location().IsIdentity()
+        explorer.Next()
+    assert located
+    
+    vertices, faces = cad_to_gltf._extract_triangulation(occ, shape)
+    reference_vertices, reference_faces = _reference_extraction(occ, shape)
+    assert np.array_equal(vertices, reference_vertices)
+    assert np.array_equal(faces, reference_faces)
+
+
+def test_small_step_meshes_in_process(step_solids):
+    _, occ = cad_to_gltf._occ()
+    parts = cad_to_gltf._step_parts(occ, cad_to_gltf._read_step(occ, step_solids))
+    assert len(parts) == 4
+    assert cad_to_gltf._step_workers(occ, parts, cad_to_gltf.ConversionOptions()) == 1
+    assert cad_to_gltf._step_workers(occ, parts, cad_to_gltf.ConversionOptions(step_workers=8)) == 4
+
+
+@pytest.mark.parametrize('assembly', [False, True])
+def test_step_workers_give_the_same_triangles(step_solids, assembly):
+    load = cad_to_gltf.load_step_assembly if assembly else cad_to_gltf.load_step
+    serial = load(step_solids, cad_to_gltf.ConversionOptions(step_workers=1))
+    parallel = load(step_solids, cad_to_gltf.ConversionOptions(step_workers=2))
+    
+    if assembly:
+        assert list(serial.geometry) == list(parallel.geometry)
+        pairs = [(serial.geometry[name], parallel.geometry[name]) for name in serial.geometry]
+    else:
+        pairs = [(serial, parallel)]
+    for a, b in pairs:
+        assert np.array_equal(a.vertices, b.vertices)
+        assert np.array_equal(a.faces, b.faces)
+
+
+def _write_sphere_step(path, radius):
+    from OCP.BRepPrimAPI import BRepPrimAPI_MakeSphere
+    from OCP.gp import gp_Pnt
+    from OCP.STEPControl import STEPControl_AsIs, STEPControl_Writer
+    
+    writer = STEPControl_Writer()
+    writer.Transfer(BRepPrimAPI_MakeSphere(gp_Pnt(0, 0, 0), radius).Shape(), STEPControl_AsIs)
+    assert writer.Write(str(path)) == 1
+    return path
+
+
+def _chord_error(mesh, radius):
+    """Largest distance from a triangle's centroid to the sphere it approximates."""
+    return np.max(radius - np.linalg.norm(mesh.triangles_center, axis=1))
+
+
+def test_linear_deflection_bounds_chord_error(tmp_path):
+    pytest.importorskip('OCP')
+    sphere = _write_sphere_step(tmp_path / 'sphere.step', 10.0)
+    counts = []
+    for linear in (0.5, 0.05):
+        options = cad_to_gltf.ConversionOptions(linear_deflection=linear, angular_deflection=1.0)
+        mesh = cad_to_gltf.load_step(sphere, options)
+        assert _chord_error(mesh, 10.0) <= linear
+        counts.append(len(mesh.faces))
+    assert counts[1] > counts[0]
+
+
+def test_auto_deflection_scales_with_the_shape(tmp_path):
+    pytest.importorskip('OCP')
+    auto = cad_to_gltf.ConversionOptions(auto_deflection=0.002, angular_deflection=1.0)
+    fixed = cad_to_gltf.ConversionOptions(linear_deflection=0.05, angular_deflection=1.0)
+    
+    small = _write_sphere_step(tmp_path / 'small.step', 5.0)
+    large = _write_sphere_step(tmp_path / 'large.step', 500.0)
+    assert len(cad_to_gltf.load_step(small, auto).faces) == len(cad_to_gltf.load_step(large, auto).faces)
+    assert len(cad_to_gltf.load_step(large, fixed).faces) > 10 * len(cad_to_gltf.load_step(small, fixed).faces)
+    
+    _, occ = cad_to_gltf._occ()
+    shape = cad_to_gltf._read_step(occ, large)
+    diagonal = cad_to_gltf.shape_diagonal(occ, shape)
+    assert cad_to_gltf.step_linear_deflection(occ, shape, auto) == pytest.approx(0.002 * diagonal)
+    assert cad_to_gltf.step_linear_deflection(occ, shape, fixed) == 0.05
+
+
+def test_deflection_sweep_reports_every_setting(tmp_path, capsys):
+    pytest.importorskip('OCP')
+    sphere = _write_sphere_step(tmp_path / 'sphere.step', 10.0)
+    rows = cad_to_gltf.deflection_sweep(str(sphere), angular_deflection=1.0)
+    
+    assert [row['fraction'] for row in rows] == list(cad_to_gltf.DEFLECTION_SWEEP)
+    diagonal = rows[0]['linear_deflection'] / rows[0]['fraction']
+    assert diagonal == pytest.approx(20.0 * np.sqrt(3), rel=1e-3)
+    for row in rows:
+        assert row['linear_deflection'] == pytest.approx(row['fraction'] * diagonal)
+        assert row['triangles'] > 0 and row['vertices'] > 0
+    # Finer settings never produce fewer triangles
+    triangles = [row['triangles'] for row in rows]
+    assert triangles == sorted(triangles) and triangles[-1] > triangles[0]
+    # The sweep agrees with a conversion at the same auto setting
+    options = cad_to_gltf.ConversionOptions(auto_deflection=rows[2]['fraction'], angular_deflection=1.0)
+    assert len(cad_to_gltf.load_step(sphere, options).faces) == rows[2]['triangles']
+    assert '--auto-deflection' in capsys.readouterr().out
+
+
+@pytest.fixture
+def step_assembly(tmp_path):
+    """An XCAF STEP assembly of a plate and four placements of one screw."""
+    pytest.importorskip('OCP')
+    from OCP.BRepPrimAPI import BRepPrimAPI_MakeBox, BRepPrimAPI_MakeCylinder
+    from OCP.gp import gp_Ax1, gp_Dir, gp_Pnt, gp_Trsf, gp_Vec
+    from OCP.STEPCAFControl import STEPCAFControl_Writer
+    from OCP.STEPControl import STEPControl_AsIs
+    from OCP.TCollection import TCollection_ExtendedString
+    from OCP.TDataStd import TDataStd_Name
+    from OCP.TDocStd import TDocStd_Document
+    from OCP.TopLoc import TopLoc_Location
+    from OCP.XCAFDoc import XCAFDoc_DocumentTool
+    
+    document = TDocStd_Document(TCollection_ExtendedString('MDTV-XCAF'))
+    tool = XCAFDoc_DocumentTool.ShapeTool_s(document.Main())
+    labels = {}
+    for name, shape in (('frame', None), ('plate', BRepPrimAPI_MakeBox(20.0, 20.0, 2.0).Shape()),
+                        ('screw', BRepPrimAPI_MakeCylinder(1.0, 8.0).Shape())):
+        labels[name] = tool.NewShape() if shape is None else tool.AddShape(shape, False)
+        TDataStd_Name.Set_s(labels[name], TCollection_ExtendedString(name))
+    tool.AddComponent(labels['frame'], labels['plate'], TopLoc_Location())
+    for i in range(4):
+        placement = gp_Trsf()
+        placement.SetRotation(gp_Ax1(gp_Pnt(0, 0, 0), gp_Dir(0, 0, 1)), 0.3 * i)
+        placement.SetTranslationPart(gp_Vec(5 + 3 * i, 5, 2))
+        tool.AddComponent(labels['frame'], labels['screw'], TopLoc_Location(placement))
+    tool.UpdateAssemblies()
+    
+    path = tmp_path / 'frame.step'
+    writer = STEPCAFControl_Writer()
+    writer.SetNameMode(True)
+    assert writer.Transfer(document, STEPControl_AsIs)
+    assert writer.Write(str(path)) == 1
+    return path
+
+
+def test_assembly_stores_each_part_once(step_assembly):
+    scene = cad_to_gltf.load_step_assembly(step_assembly)
+    
+    assert sorted(scene.geometry) == ['plate', 'screw']
+    instances = {node: scene.graph[node] for node in scene.graph.nodes_geometry}
+    assert sorted(geometry for _, geometry in instances.values()) == ['plate'] + ['screw'] * 4
+    offsets = sorted(tuple(np.round(matrix[:3, 3], 9)) for matrix, geometry in instances.values()
+                     if geometry == 'screw')
+    assert offsets == [(5 + 3 * i, 5, 2) for i in range(4)]
+    
+    # Placing the instances gives the triangles of the flattened model
+    flat = cad_to_gltf.load_step(step_assembly)
+    placed = scene.to_geometry()
+    assert len(placed.faces) == len(flat.faces)
+    assert np.allclose(np.sort(placed.triangles_center, axis=0), np.sort(flat.triangles_center, axis=0))
+
+
+def test_assembly_gltf_instances_meshes(tmp_path, step_assembly):
+    output = tmp_path / 'frame.gltf'
+    options = cad_to_gltf.ConversionOptions(assembly=True)
+    assert cad_to_gltf.convert(str(step_assembly), str(output), options=options)
+    
+    document = json.loads(output.read_text())
+    assert len(document['meshes']) == 2
+    used = [node['mesh'] for node in document['nodes'] if 'mesh' in node]
+    assert sorted(used.count(mesh) for mesh in set(used)) == [1, 4]
+    
+    loaded = trimesh.load(output)
+    assert len(loaded.graph.nodes_geometry) == 5
+    assert len(loaded.to_geometry().faces) == len(cad_to_gltf.load_step(step_assembly).faces)
+
+
+# =============================================================================
+# glTF export
+# =============================================================================
+
+_GLTF_OUTPUTS = [('.glb', 'external'), ('.gltf', 'external'), ('.gltf', 'embedded')]
+
+
+@pytest.mark.parametrize('suffix, buffers', _GLTF_OUTPUTS)
+def test_gltf_round_trips(tmp_path, suffix, buffers):
+    mesh = trimesh.creation.icosphere(2)
+    output = tmp_path / f'sphere{suffix}'
+    written = cad_to_gltf.export_gltf(mesh, output, buffers, normals=True)
+    
+    assert [p.suffix for p in written] == ([suffix, '.bin'] if suffix == '.gltf' and buffers == 'external'
+                                           else [suffix])
+    loaded = trimesh.load(output, force='mesh')
+    assert np.allclose(loaded.vertices, np.asarray(mesh.vertices, dtype=np.float32))
+    assert np.array_equal(loaded.faces, mesh.faces)
+
+
+@pytest.mark.parametrize('suffix, buffers', _GLTF_OUTPUTS)
+def test_gltf_scene_skips_empty_geometry(tmp_path, suffix, buffers):
+    scene = trimesh.Scene()
+    scene.add_geometry(trimesh.creation.box(), node_name='box', geom_name='box')
+    scene.add_geometry(trimesh.Trimesh(), node_name='empty', geom_name='empty')
+    output = tmp_path / f'scene{suffix}'
+    cad_to_gltf.export_gltf(scene, output, buffers)
+    
+    loaded = trimesh.load(output)
+    assert list(loaded.geometry) == ['box']
+    assert len(loaded.geometry['box'].faces) == 12
+
+
+def test_gltf_refuses_empty_mesh(tmp_path):
+    with pytest.raises(ValueError, match='no triangles'):
+        cad_to_gltf.export_gltf(trimesh.Trimesh(), tmp_path / 'empty.glb')
+    assert not (tmp_path / 'empty.glb').exists()
+
+
+def test_gltf_empty_scene_has_no_empty_arrays(tmp_path):
+    scene = trimesh.Scene()
+    scene.add_geometry(trimesh.Trimesh(), node_name='empty', geom_name='empty')
+    output = tmp_path / 'empty.gltf'
+    cad_to_gltf.export_gltf(scene, output)
+    
+    document = json.loads(output.read_text())
+    assert not [key for key, value in document.items() if value == []]
+    assert 'buffers' not in document
+
+
+# =============================================================================
+# Decimation and budgets
+# =============================================================================
+
+@pytest.fixture
+def torus():
+    return trimesh.creation.torus(1.0, 0.3, major_sections=24, minor_sections=12)
+
+
+def _clustered_face_count(mesh, resolution):
+    cluster = cad_to_gltf._cluster_vertices(np.asarray(mesh.vertices), resolution)[0]
+    return len(cad_to_gltf._collapse_faces(np.asarray(mesh.faces), cluster))
+
+
+@pytest.mark.parametrize('target', [1, 3, 10])
+def test_decimate_never_empties_the_mesh(torus, target):
+    # The coarsest grids collapse this torus to nothing
+    assert _clustered_face_count(torus, 1) == 0
+    decimated = cad_to_gltf.decimate_mesh(torus, target)
+    assert len(decimated.faces) > 0
+    assert len(decimated.faces) == min(n for n in (_clustered_face_count(torus, r) for r in range(1, 40)) if n)
+
+
+def test_decimate_searches_past_non_monotonic_counts(torus):
+    counts = {r: _clustered_face_count(torus, r) for r in range(1, 40)}
+    # A finer grid can keep fewer faces, which plain bisection lands on
+    assert counts[15] > counts[16]
+    best = max(n for n in counts.values() if n <= 540)
+    assert len(cad_to_gltf.decimate_mesh(torus, 540).faces) == best == 536
+
+
+def test_fit_budget_refuses_to_empty_the_mesh(tmp_path, torus):
+    options = cad_to_gltf.ConversionOptions(max_triangles=3)
+    with pytest.raises(ValueError, match='3 triangles'):
+        cad_to_gltf.fit_budget(torus, tmp_path / 'torus.glb', options)
+
+
+def test_fit_budget_meets_triangle_budget(tmp_path, torus):
+    options = cad_to_gltf.ConversionOptions(max_triangles=100)
+    fitted = cad_to_gltf.fit_budget(torus, tmp_path / 'torus.glb', options)
+    assert 0 < len(fitted.faces) <= 100
+
+
+@pytest.mark.parametrize('suffix', ['.glb', '.gltf'])
+def test_lods_keep_every_level_loadable(tmp_path, torus, suffix):
+    output = tmp_path / f'torus{suffix}'
+    written = cad_to_gltf.export_lods(torus, output, (0.25, 0.001))
+    
+    manifest = json.loads((tmp_path / 'torus.lod.json').read_text())
+    assert [level['ratio'] for level in manifest['levels']] == [1.0, 0.25, 0.001]
+    assert all(level['triangles'] > 0 for level in manifest['levels'])
+    for level in manifest['levels']:
+        assert (tmp_path / level['uri']) in written
+        loaded = trimesh.load(tmp_path / level['uri'], force='mesh')
+        assert len(loaded.faces) == level['triangles']
+
+
+def test_msft_lod_keeps_every_level(tmp_path, torus):
+    output = tmp_path / 'torus.glb'
+    cad_to_gltf.export_lods(torus, output, (0.25, 0.001), lod_format='msft_lod')
+    
+    scene = trimesh.load(output)
+    assert len(scene.geometry) == 3
+    assert all(len(g.faces) > 0 for g in scene.geometry.values())
+
+
+# =============================================================================
+# Triangle and vertex order
+# =============================================================================
+
+def _triangle_set(mesh):
+    """Triangles as sorted coordinate tuples, each rotated to start at its smallest corner."""
+    triangles = []
+    for corners in np.asarray(mesh.vertices)[np.asarray(mesh.faces)].tolist():
+        start = corners.index(min(corners))
+        triangles.append(tuple(map(tuple, corners[start:] + corners[:start])))
+    return sorted(triangles)
+
+
+@pytest.fixture
+def shuffled_torus(torus):
+    """The torus with its triangles and vertices in random order."""
+    rng = np.random.default_rng(3)
+    order = rng.permutation(len(torus.vertices))
+    faces = np.argsort(order)[torus.faces][rng.permutation(len(torus.faces))]
+    return trimesh.Trimesh(torus.vertices[order], faces, process=False)
+
+
+@pytest.mark.parametrize('large', [False, True])
+def test_reorder_keeps_the_same_triangles(monkeypatch, shuffled_torus, large):
+    if large:
+        monkeypatch.setattr(cad_to_gltf, 'TIPSIFY_MAX_TRIANGLES', 0)
+    reordered = cad_to_gltf.reorder_mesh(shuffled_torus, report=False)
+    
+    assert _triangle_set(reordered) == _triangle_set(shuffled_torus)
+    assert len(reordered.vertices) == len(shuffled_torus.vertices)
+    before, _ = cad_to_gltf.analyze_vertex_cache(shuffled_torus.faces)
+    after, _ = cad_to_gltf.analyze_vertex_cache(reordered.faces)
+    assert after < before
+    # Vertices are numbered in order of first use
+    _, first = np.unique(reordered.faces.ravel(), return_index=True)
+    assert np.all(np.diff(first) > 0)
+
+
+def test_optimize_mesh_can_keep_the_loader_order(shuffled_torus):
+    faces = shuffled_torus.faces.copy()
+    kept = cad_to_gltf.optimize_mesh(shuffled_torus.copy(), report=False, merge=False, reorder=False)
+    assert np.array_equal(kept.faces, faces)
+    reordered = cad_to_gltf.optimize_mesh(shuffled_torus.copy(), report=False, merge=False)
+    assert _triangle_set(reordered) == _triangle_set(kept)
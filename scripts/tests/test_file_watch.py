@@ -0,0 +1,83 @@
+"""
+Tests for file_watch.py.
+
+Run from the repository root with:  python -m pytest scripts/tests
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+from file_watch import FileWatcher
+
+# Longest a test waits for the watcher before failing instead of hanging
+TIMEOUT = 10.0
+
+
+def _changes_after(watcher, edit):
+    """Run edit while watcher.changes() blocks in another thread; returns what it reported."""
+    result = []
+    waiting = threading.Thread(target=lambda: result.append(watcher.changes()), daemon=True)
+    waiting.start()
+    edit()
+    waiting.join(TIMEOUT)
+    assert result, "watcher reported no changes"
+    return result[0]
+
+
+@pytest.fixture(params=[True, False], ids=['polling', 'inotify'])
+def watched(request, tmp_path):
+    """A watched tree with one STL file, and its watcher."""
+    if not request.param and not sys.platform.startswith('linux'):
+        pytest.skip('inotify is Linux only')
+    (tmp_path / 'part.stl').write_bytes(b'solid part')
+    watcher = FileWatcher([tmp_path], {'.stl', '.step'}, poll=request.param)
+    yield tmp_path, watcher
+    watcher.close()
+
+
+def test_polling_backend(tmp_path):
+    watcher = FileWatcher([tmp_path], {'.stl'}, poll=True)
+    assert watcher.backend == 'polling'
+
+
+def test_reports_modified_and_new_files(watched):
+    root, watcher = watched
+    assert watcher.files() == [(root / 'part.stl').resolve()]
+    
+    def edit():
+        (root / 'part.stl').write_bytes(b'solid part, re-exported')
+        (root / 'sub').mkdir()
+        (root / 'sub' / 'new.STEP').write_bytes(b'ISO-10303-21;')
+        (root / 'notes.txt').write_text('not watched')
+    
+    assert _changes_after(watcher, edit) == [(root / 'part.stl').resolve(), (root / 'sub' / 'new.STEP').resolve()]
+    
+    # Files in the new directory are watched too
+    changed = _changes_after(watcher, lambda: (root / 'sub' / 'new.STEP').write_bytes(b'ISO-10303-21; v2'))
+    assert changed == [(root / 'sub' / 'new.STEP').resolve()]
+
+
+def test_replacing_a_file_through_a_rename_is_a_change(watched):
+    root, watcher = watched
+    
+    def edit():
+        (root / 'part.stl.tmp').write_bytes(b'solid part, saved by an editor')
+        os.replace(root / 'part.stl.tmp', root / 'part.stl')
+    
+    assert _changes_after(watcher, edit) == [(root / 'part.stl').resolve()]
+
+
+def test_deletions_only_update_the_snapshot(watched):
+    root, watcher = watched
+    (root / 'other.stl').write_bytes(b'solid other')
+    assert _changes_after(watcher, lambda: None) == [(root / 'other.stl').resolve()]
+    
+    def edit():
+        (root / 'part.stl').unlink()
+        (root / 'other.stl').write_bytes(b'solid other, modified')
+    
+    assert _changes_after(watcher, edit) == [(root / 'other.stl').resolve()]
+    assert watcher.files() == [(root / 'other.stl').resolve()]
@@ -0,0 +1,508 @@
+"""
+Tests for spice_to_svg.py.
+
+Run from the repository root with:  python -m pytest scripts/tests
+"""
+
+import io
+import json
+import signal
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from xml.dom import minidom
+
+import pytest
+
+import spice_to_svg
+from spice_to_svg import NetlistError, SPICEParser
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(textwrap.dedent(text).lstrip())
+    return path
+
+
+# =============================================================================
+# .INCLUDE, .LIB and .SUBCKT
+# =============================================================================
+
+@pytest.fixture
+def library(tmp_path):
+    """A corner library with one subcircuit per section."""
+    return _write(tmp_path / 'models' / 'corners.lib', """
+        * corner library
+        .LIB tt
+        .SUBCKT amp in out
+        R1 in out 1k
+        .ENDS
+        .ENDL
+        .LIB ff
+        .SUBCKT buf in out
+        C1 in out 1p
+        .ENDS
+        .ENDL ff
+    """)
+
+
+def _parse(path, expand='block'):
+    parser = SPICEParser(filepath=str(path), expand=expand)
+    components, _ = parser.parse()
+    return parser, components
+
+
+def test_lib_section_reads_only_that_section(tmp_path, library, capsys):
+    netlist = _write(tmp_path / 'top.cir', """
+        corner test
+        .LIB models/corners.lib tt
+        X1 a b amp
+        V1 a 0 1
+        .end
+    """)
+    parser, components = _parse(netlist)
+    assert set(parser.subcircuits) == {'AMP'}
+    assert components['X1'].pins == ['in', 'out']
+    assert parser.sources == [str(netlist), str(library)]
+    assert 'Warning' not in capsys.readouterr().out
+
+
+def test_bare_lib_reads_every_section(tmp_path, library, capsys):
+    netlist = _write(tmp_path / 'top.cir', """
+        whole library
+        .LIB models/corners.lib
+        X1 a b amp
+        X2 b 0 buf
+        .end
+    """)
+    parser, components = _parse(netlist)
+    assert set(parser.subcircuits) == {'AMP', 'BUF'}
+    assert components['X2'].pins == ['in', 'out']
+    # Section headers inside the file are not includes of their own
+    assert 'Warning' not in capsys.readouterr().out
+
+
+def test_include_is_read_once_and_missing_files_warn(tmp_path, capsys):
+    _write(tmp_path / 'parts.inc', """
+        .SUBCKT div top bottom mid
+        R1 top mid 10k
+        R2 mid bottom 10k
+        .ENDS div
+    """)
+    netlist = _write(tmp_path / 'top.cir', """
+        includes
+        .INCLUDE parts.inc
+        .INC "parts.inc"
+        .INCLUDE missing.inc
+        X1 in 0 out div
+        .end
+    """)
+    parser, components = _parse(netlist)
+    out = capsys.readouterr().out
+    assert parser.sources.count(str(tmp_path / 'parts.inc')) == 1
+    assert 'redefined' not in out
+    assert 'file not found' in out and 'missing.inc' in out
+    assert components['X1'].pins == ['top', 'bottom', 'mid']
+
+
+def test_flatten_nested_subcircuits(tmp_path):
+    netlist = _write(tmp_path / 'top.cir', """
+        nested
+        .SUBCKT stage in out
+        R1 in mid 1k
+        XB mid out buf
+        C2 out 0 10p
+        .ENDS
+        .SUBCKT buf a b
+        R9 a b 0
+        .ENDS
+        X1 src load stage
+        X2 load sink stage
+        V1 src 0 1
+        .end
+    """)
+    _, components = _parse(netlist, expand='flatten')
+    assert set(components) == {'V1', 'X1.R1', 'X1.XB.R9', 'X1.C2', 'X2.R1', 'X2.XB.R9', 'X2.C2'}
+    # Pins map to the instance's nodes, internal nodes get the instance prefix,
+    # ground stays global
+    assert components['X1.R1'].nodes == ['src', 'X1.mid']
+    assert components['X1.XB.R9'].nodes == ['X1.mid', 'load']
+    assert components['X2.C2'].nodes == ['sink', '0']
+
+
+def test_recursive_subcircuit_is_an_error(tmp_path):
+    netlist = _write(tmp_path / 'top.cir', """
+        recursion
+        .SUBCKT loop a b
+        X1 a b loop
+        .ENDS
+        X1 in out loop
+        .end
+    """)
+    with pytest.raises(NetlistError, match='instantiates itself'):
+        _parse(netlist, expand='flatten')
+
+
+def test_self_include_warns(tmp_path, capsys):
+    netlist = _write(tmp_path / 'top.cir', """
+        self include
+        .INCLUDE top.cir
+        R1 a 0 1k
+        .end
+    """)
+    _, components = _parse(netlist)
+    assert 'includes itself' in capsys.readouterr().out
+    assert set(components) == {'R1'}
+
+
+# =============================================================================
+# SVG writer
+# =============================================================================
+
+def _minidom_svg(root):
+    """The pretty-printing the renderer used before write_svg: minidom, blank lines dropped."""
+    pretty = minidom.parseString(ET.tostring(root, encoding='unicode')).toprettyxml(indent='  ')
+    lines = [line for line in pretty.split('\n') if line.strip()]
+    return '\n'.join(lines[1:] if lines and lines[0].startswith('<?xml') else lines)
+
+
+def _rendered_tree(tmp_path, monkeypatch, netlist_text):
+    """Render a netlist and keep the element tree it saved."""
+    trees = []
+    save = spice_to_svg.SchematicRenderer._save_svg
+    
+    def keep(self, root, output_file):
+        trees.append(root)
+        save(self, root, output_file)
+    
+    monkeypatch.setattr(spice_to_svg.SchematicRenderer, '_save_svg', keep)
+    netlist = _write(tmp_path / 'circuit.cir', netlist_text)
+    output = tmp_path / 'circuit.svg'
+    assert spice_to_svg.convert_file(str(netlist), str(output)) is not None
+    return trees[0], output
+
+
+@pytest.mark.parametrize('example', sorted(p.name for p in spice_to_svg.EXAMPLES_DIR.glob('*.cir')))
+def test_write_svg_matches_minidom(tmp_path, monkeypatch, example):
+    text = (spice_to_svg.EXAMPLES_DIR / example).read_text()
+    root, output = _rendered_tree(tmp_path, monkeypatch, text)
+    assert output.read_text(encoding='utf-8') == _minidom_svg(root)
+
+
+def test_write_svg_escapes_like_minidom(tmp_path, monkeypatch):
+    root, output = _rendered_tree(tmp_path, monkeypatch, """
+        .TITLE Bias <rev "B"> & notes
+        R1 in&out 0 10k
+        C1 in&out <x> 1n
+        V1 <x> 0 DC 5
+        .end
+    """)
+    assert output.read_text(encoding='utf-8') == _minidom_svg(root)
+
+
+def test_write_svg_mixed_content():
+    root = ET.Element('svg', {'xmlns': 'http://www.w3.org/2000/svg'})
+    text = ET.SubElement(root, 'text', {'x': '1'})
+    text.text = 'a > b'
+    group = ET.SubElement(root, 'g')
+    group.text = 'lead'
+    ET.SubElement(group, 'line').tail = 'tail & more'
+    ET.SubElement(root, 'title').text = 'multi\nline'
+    
+    out = io.StringIO()
+    spice_to_svg.write_svg(root, out)
+    assert out.getvalue() == _minidom_svg(root)
+    
+    # Minified output is minidom's unindented toxml()
+    out = io.StringIO()
+    spice_to_svg.write_svg(root, out, indent=None)
+    flat = minidom.parseString(ET.tostring(root, encoding='unicode')).documentElement.toxml()
+    assert out.getvalue() == flat
+
+
+# =============================================================================
+# Placement and routing
+# =============================================================================
+
+EXAMPLES = sorted(p.name for p in spice_to_svg.EXAMPLES_DIR.glob('*.cir'))
+
+
+def _ladder(path, stages):
+    """An RC ladder driven by V1: R1..Rn in series, each node shunted to ground by a capacitor."""
+    lines = ['ladder', 'V1 n0 0 AC 1']
+    for i in range(1, stages + 1):
+        lines += [f'R{i} n{i - 1} n{i} 1k', f'C{i} n{i} 0 1n']
+    path.write_text('\n'.join(lines + ['.end', '']))
+    return path
+
+
+def _renderer(netlist, layout='auto'):
+    parser = SPICEParser(filepath=str(netlist))
+    components, connections = parser.parse()
+    return spice_to_svg.SchematicRenderer(components, connections, parser.title, layout)
+
+
+def _wire_length(renderer):
+    """Half-perimeter wire length of the component centres over every non-ground net."""
+    total = 0
+    for node, conn in renderer.connections.items():
+        if node.upper() in renderer.GROUND_NAMES or len(conn.components) < 2:
+            continue
+        xs = [renderer.components[name].x for name, _ in conn.components]
+        ys = [renderer.components[name].y for name, _ in conn.components]
+        total += max(xs) - min(xs) + max(ys) - min(ys)
+    return total
+
+
+@pytest.mark.parametrize('example', EXAMPLES)
+def test_examples_place_connected_parts_closer_than_the_grid(example):
+    placed = _renderer(spice_to_svg.EXAMPLES_DIR / example)
+    placed._calculate_layout()
+    grid = _renderer(spice_to_svg.EXAMPLES_DIR / example, layout='grid')
+    grid._calculate_layout()
+    
+    positions = [(comp.x, comp.y) for comp in placed.components.values()]
+    assert len(set(positions)) == len(positions)
+    assert _wire_length(placed) < _wire_length(grid)
+
+
+@pytest.mark.parametrize('stages', [30, 2500])
+def test_placement_follows_signal_flow(tmp_path, stages):
+    renderer = _renderer(_ladder(tmp_path / 'ladder.cir', stages))
+    renderer._calculate_layout()
+    components = renderer.components
+    
+    positions = [(comp.x, comp.y) for comp in components.values()]
+    assert len(set(positions)) == len(positions)
+    assert components['V1'].x == min(comp.x for comp in components.values())
+    # Each series resistor sits in the same column as the one before it or further right
+    xs = [components[f'R{i}'].x for i in range(1, stages + 1)]
+    assert xs == sorted(xs)
+
+
+def _wire_segments(svg):
+    """Straight segments of every wire, routed or direct, in a rendered schematic's wires layer."""
+    segments = []
+    layer = ET.parse(svg).getroot().find("{http://www.w3.org/2000/svg}g[@id='wires']")
+    for element in layer:
+        if element.get('class') != 'wire':
+            continue
+        if element.tag.endswith('}line'):
+            segments.append(tuple((int(element.get(f'x{i}')), int(element.get(f'y{i}'))) for i in (1, 2)))
+            continue
+        for subpath in element.get('d').split('M')[1:]:
+            points = [tuple(int(v) for v in point.split()) for point in subpath.split('L')]
+            segments += zip(points, points[1:])
+    return segments
+
+
+@pytest.mark.parametrize('netlist', EXAMPLES + ['ladder'])
+def test_router_connects_every_pin_around_symbols(tmp_path, netlist):
+    path = _ladder(tmp_path / 'ladder.cir', 60) if netlist == 'ladder' else spice_to_svg.EXAMPLES_DIR / netlist
+    renderer = _renderer(path)
+    renderer.render(str(tmp_path / 'schematic.svg'))
+    
+    assert renderer.unrouted == 0
+    segments = _wire_segments(tmp_path / 'schematic.svg')
+    assert segments
+    # Wires are orthogonal
+    assert all(x0 == x1 or y0 == y1 for (x0, y0), (x1, y1) in segments)
+    # and stay out of every symbol body (well inside the blocked footprint, clear of the ports)
+    for comp in renderer.components.values():
+        for (x0, y0), (x1, y1) in segments:
+            assert not (min(x0, x1) < comp.x + 50 and max(x0, x1) > comp.x - 50 and
+                        min(y0, y1) < comp.y + 40 and max(y0, y1) > comp.y - 40), comp.name
+    # Every pin of a multi-pin net ends a wire
+    ends = {point for segment in segments for point in segment}
+    for node, positions in renderer.node_positions.items():
+        if len(positions) > 1:
+            assert {(x, y) for x, y, _, _ in positions} <= ends, node
+
+
+# =============================================================================
+# Symbols
+# =============================================================================
+
+SVG = '{http://www.w3.org/2000/svg}'
+XLINK_HREF = '{http://www.w3.org/1999/xlink}href'
+
+
+def _symbol_uses(svg):
+    """Ids of the symbols in <defs>, and how many <use> elements place each one."""
+    root = ET.parse(svg).getroot()
+    symbols = [g.get('id') for g in root.find(f'{SVG}defs').findall(f'{SVG}g')]
+    uses = {}
+    for use in root.iter(f'{SVG}use'):
+        assert use.get('href') == use.get(XLINK_HREF)
+        uses[use.get('href')[1:]] = uses.get(use.get('href')[1:], 0) + 1
+    return symbols, uses
+
+
+@pytest.mark.parametrize('example', EXAMPLES)
+def test_each_symbol_is_drawn_once(tmp_path, example):
+    output = tmp_path / 'schematic.svg'
+    parser = spice_to_svg.convert_file(str(spice_to_svg.EXAMPLES_DIR / example), str(output))
+    symbols, uses = _symbol_uses(output)
+    
+    by_type = {}
+    for comp in parser.components.values():
+        name = spice_to_svg.SchematicRenderer.SYMBOL_LIBRARY[comp.type][0]
+        by_type[f'sym-{name}'] = by_type.get(f'sym-{name}', 0) + 1
+    assert sorted(symbols) == sorted(by_type)
+    assert uses == by_type
+
+
+def test_blocks_share_a_symbol_per_pin_list(tmp_path):
+    netlist = _write(tmp_path / 'blocks.cir', """
+        two stages and a mixer
+        .SUBCKT amp in out
+        R1 in out 1k
+        .ENDS
+        .SUBCKT buffer in out
+        R1 in out 10
+        .ENDS
+        .SUBCKT mix a b out
+        R1 a out 1k
+        R2 b out 1k
+        .ENDS
+        V1 in 0 DC 1
+        X1 in mid amp
+        X2 mid a buffer
+        X3 in b amp
+        X4 a b out mix
+        RL out 0 10k
+        .end
+    """)
+    output = tmp_path / 'blocks.svg'
+    assert spice_to_svg.convert_file(str(netlist), str(output), expand='block') is not None
+    symbols, uses = _symbol_uses(output)
+    
+    assert sorted(symbols) == ['sym-block-1', 'sym-block-2', 'sym-resistor', 'sym-voltage-source']
+    assert sorted(uses.values()) == [1, 1, 1, 3]
+    assert uses['sym-resistor'] == uses['sym-voltage-source'] == 1
+
+
+# =============================================================================
+# Batch mode
+# =============================================================================
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_batch_isolates_failures(tmp_path, workers):
+    circuits = tmp_path / 'circuits'
+    _write(circuits / 'divider.cir', """
+        divider
+        V1 in 0 DC 5
+        R1 in out 10k
+        R2 out 0 10k
+        .end
+    """)
+    _write(circuits / 'sub' / 'filter.sp', """
+        rc filter
+        .INCLUDE missing.lib
+        R1 in out 1k
+        C1 out 0 1u
+        .end
+    """)
+    _write(circuits / 'empty.cir', """
+        only a title
+        .end
+    """)
+    _write(circuits / 'loop.net', """
+        recursion
+        .SUBCKT loop a b
+        X1 a b loop
+        .ENDS
+        X1 in out loop
+        .end
+    """)
+    report = tmp_path / 'report.json'
+    
+    ok = spice_to_svg.convert_batch([str(circuits), str(tmp_path / 'nowhere.cir')], report,
+                                    workers=workers, expand='flatten')
+    
+    assert not ok
+    assert (circuits / 'divider.svg').is_file()
+    assert (circuits / 'sub' / 'filter.svg').is_file()
+    files = {Path(f['input']).name: f for f in json.loads(report.read_text())['files']}
+    assert {name for name, f in files.items() if f['ok']} == {'divider.cir', 'filter.sp'}
+    assert files['divider.cir']['components'] == 3
+    assert files['filter.sp']['warnings'] and 'missing.lib' in files['filter.sp']['warnings'][0]
+    assert files['empty.cir']['error'] == 'No components found'
+    assert 'instantiates itself' in files['loop.net']['error']
+    assert 'not found' in files['nowhere.cir']['error']
+
+
+# =============================================================================
+# Watch mode
+# =============================================================================
+
+# Longest a test waits for the watcher before failing instead of hanging
+WATCH_TIMEOUT = 30.0
+
+
+def _wait_for(lines, text, count=1):
+    """Wait until count output lines contain text."""
+    deadline = time.monotonic() + WATCH_TIMEOUT
+    while sum(text in line for line in lines) < count:
+        assert time.monotonic() < deadline, f"no {text!r} after {WATCH_TIMEOUT}s:\n{''.join(lines)}"
+        time.sleep(0.05)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='needs SIGINT')
+def test_watch_rerenders_netlists_and_their_includes(tmp_path):
+    circuits = tmp_path / 'circuits'
+    _write(circuits / 'models' / 'amp.lib', """
+        .SUBCKT amp in out
+        R1 in out 1k
+        .ENDS
+    """)
+    _write(circuits / 'amp.cir', """
+        amplifier
+        .INCLUDE models/amp.lib
+        V1 in 0 DC 1
+        X1 in out amp
+        R2 out 0 10k
+        .end
+    """)
+    _write(circuits / 'divider.cir', """
+        divider
+        V1 in 0 DC 5
+        R1 in out 10k
+        R2 out 0 10k
+        .end
+    """)
+    
+    process = subprocess.Popen([sys.executable, '-u', spice_to_svg.__file__, '--watch', '--poll', str(circuits)],
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    lines = []
+    threading.Thread(target=lambda: lines.extend(process.stdout), daemon=True).start()
+    try:
+        _wait_for(lines, 'amp.cir →')
+        _wait_for(lines, 'divider.cir →')
+        assert (circuits / 'amp.svg').is_file() and (circuits / 'divider.svg').is_file()
+        # Changing a library re-renders the netlists that include it
+        _write(circuits / 'models' / 'amp.lib', """
+            .SUBCKT amp in out
+            R1 in out 2k
+            C1 out 0 1n
+            .ENDS
+        """)
+        _wait_for(lines, 'amp.cir →', count=2)
+        # and editing another netlist leaves it alone
+        _write(circuits / 'divider.cir', """
+            divider
+            V1 in 0 DC 5
+            R1 in out 10k
+            R2 out 0 20k
+            .end
+        """)
+        _wait_for(lines, 'divider.cir →', count=2)
+        assert sum('amp.cir →' in line for line in lines) == 2
+    finally:
+        process.send_signal(signal.SIGINT)
+        assert process.wait(WATCH_TIMEOUT) == 0
+    assert '(polling, 3 files)' in lines[0]